@@ -29,7 +29,11 @@ const App: React.FC = () => {
       setIsBackendOnline(true);
       setJobs(prev => {
         const simulationJobs = prev.filter(j => j.is_simulation);
-        const apiJobs = data.map((j: any) => ({ ...j, is_simulation: false }));
+        // The list endpoint omits logs/files; keep any details already loaded
+        const apiJobs = data.map((j: any) => {
+          const known = prev.find(p => p.id === j.id);
+          return { logs: '', files: [], ...known, ...j, is_simulation: false };
+        });
         const merged = [...apiJobs];
         simulationJobs.forEach(sim => {
           if (!merged.find(m => m.id === sim.id)) merged.push(sim);
@@ -42,12 +46,28 @@ const App: React.FC = () => {
     }
   }, []);
 
+  const fetchActiveJob = useCallback(async () => {
+    if (!activeJobId || activeJobId.startsWith('sim-')) return;
+    try {
+      const detail = await apiService.getJob(activeJobId);
+      setJobs(prev => prev.map(j => j.id === detail.id ? { ...j, ...detail } : j));
+    } catch (err) {
+      console.warn("Failed to fetch job details.");
+    }
+  }, [activeJobId]);
+
   useEffect(() => {
     fetchJobsList();
     const interval = setInterval(fetchJobsList, 10000);
     return () => clearInterval(interval);
   }, [fetchJobsList]);
 
+  useEffect(() => {
+    fetchActiveJob();
+    const interval = setInterval(fetchActiveJob, 5000);
+    return () => clearInterval(interval);
+  }, [fetchActiveJob]);
+
   const handleCreateJob = async (task: string, repo?: string, persona?: string, useSearch?: boolean) => {
     try {
       if (!isBackendOnline) throw new Error("Backend offline");
@@ -1,14 +1,139 @@
 import os
-import json
+import re
+import time
+import random
+import functools
 import logging
 import asyncio
-from typing import Optional, List, Dict, Any
+import threading
+from typing import Optional, Union, List, Dict, Any, Deque, AsyncIterator, Awaitable, Callable, Iterable, Mapping
+from collections import deque
+from hashlib import blake2b
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from google.genai import GoogleGenAI
+from types import MappingProxyType
+
+import httpx
+import msgspec
+import numpy as np
+import orjson
+from cachetools import TTLCache
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types as genai_types
 
 logger = logging.getLogger(__name__)
 
+# Client error codes that are still worth retrying (timeout, rate limited)
+_RETRYABLE_CLIENT_CODES = frozenset({408, 429})
+
+# Error messages that retrying cannot fix
+_NON_RETRYABLE_RE = re.compile(
+    r"invalid api key|authentication failed|invalid model|content policy violation",
+    re.IGNORECASE,
+)
+
+# Prompt templates
+_PLAN_PROMPT_TMPL = """Create a detailed step-by-step technical execution plan for the following task:
+
+TASK: {task}
+
+{context_str}
+
+Requirements:
+- Break down the task into clear, actionable steps
+- Each step should have specific commands where applicable
+- Include expected outcomes for verification
+- Maximum {max_steps} steps
+- Consider dependencies between steps
+"""
+
+_PLAN_SYSTEM_INSTRUCTION = """You are Celia AI Agent, an expert in technical planning and execution.
+
+Respond ONLY with a valid JSON array. Each object must have this exact structure:
+{
+    "step_number": <integer>,
+    "action": "<clear description of what to do>",
+    "expected_outcome": "<measurable result>",
+    "commands": ["<command1>", "<command2>"],
+    "estimated_time": "<e.g., '2 minutes'>",
+    "dependencies": [<step_numbers this depends on>],
+    "parallel_commands": <optional; true only if the step's commands are independent and may run concurrently>
+}
+
+Ensure:
+- Commands are safe and executable
+- No destructive operations without explicit confirmation
+- Steps are in logical order
+- Each step builds on previous ones"""
+
+_SUMMARY_PROMPT_TMPL = """Analyze the following execution results and create a professional summary:
+
+STATUS: {status}
+{time_str}
+
+GENERATED FILES:
+{files}
+
+EXECUTION LOGS (most recent lines):
+```
+{logs}
+```
+
+Provide a summary with:
+1. Overall execution status and success
+2. Key accomplishments
+3. Files generated and their purposes
+4. Any warnings or issues encountered
+5. Next steps or recommendations"""
+
+_SUMMARY_SYSTEM_INSTRUCTION = """You are a technical report writer. Create clear, professional summaries that:
+- Use active voice
+- Highlight key results
+- Identify any issues or warnings
+- Provide actionable insights
+- Are concise but comprehensive"""
+
+
+# Fixed generation configs for the built-in call sites
+_PLAN_CONFIG: Mapping[str, Any] = MappingProxyType({
+    "temperature": 0.3,  # Lower temperature for more consistent planning
+    "system_instruction": _PLAN_SYSTEM_INSTRUCTION,
+    "response_mime_type": "application/json",
+})
+
+_SUMMARY_CONFIG: Mapping[str, Any] = MappingProxyType({
+    "temperature": 0.5,
+    "system_instruction": _SUMMARY_SYSTEM_INSTRUCTION,
+})
+
+_HEALTH_CONFIG: Mapping[str, Any] = MappingProxyType({
+    "temperature": 0,
+})
+
+
+@functools.lru_cache(maxsize=32)
+def _build_base_config(
+    temperature: float,
+    json_mode: bool,
+    system_instruction: Optional[str],
+) -> Mapping[str, Any]:
+    """Build the read-only part of a generation config shared by many calls."""
+    config: Dict[str, Any] = {
+        "temperature": temperature,
+    }
+    
+    if system_instruction:
+        config["system_instruction"] = system_instruction
+    
+    if json_mode:
+        config["response_mime_type"] = "application/json"
+    
+    return MappingProxyType(config)
+
+
+# Keep-alive connection pool settings for each GeminiClient's HTTP client
+_HTTPX_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+
 
 @dataclass
 class RetryConfig:
@@ -26,37 +151,125 @@ class RateLimitConfig:
     tokens_per_minute: int = 100000
 
 
+class PlanStep(msgspec.Struct):
+    """A single step of an execution plan as returned by the model."""
+    step_number: Optional[int] = None
+    action: str = "Undefined action"
+    expected_outcome: str = "N/A"
+    commands: Optional[List[str]] = None
+    estimated_time: Optional[Union[str, int, float]] = None
+    dependencies: Optional[List[int]] = None
+    parallel_commands: Optional[bool] = None
+
+
 class RateLimiter:
-    """Simple token bucket rate limiter."""
+    """Sliding-window rate limiter."""
+    
+    WINDOW_SECONDS = 60.0
     
     def __init__(self, config: RateLimitConfig):
         self.config = config
-        self.request_timestamps: List[datetime] = []
+        self.request_timestamps: Deque[float] = deque()  # time.monotonic() values
         self.lock = asyncio.Lock()
     
+    def _prune(self, now: float) -> None:
+        """Drop timestamps that have left the one-minute window."""
+        cutoff = now - self.WINDOW_SECONDS
+        timestamps = self.request_timestamps
+        while timestamps and timestamps[0] <= cutoff:
+            timestamps.popleft()
+    
     async def acquire(self) -> None:
         """Wait until a request can be made within rate limits."""
+        # Fast path: room in the window and nobody queued. Nothing awaits
+        # between the check and the append, so no lock is needed.
+        now = time.monotonic()
+        self._prune(now)
+        if not self.lock.locked() and len(self.request_timestamps) < self.config.requests_per_minute:
+            self.request_timestamps.append(now)
+            return
+        
+        # Slow path: queue up behind other waiters
         async with self.lock:
-            now = datetime.utcnow()
-            cutoff = now - timedelta(minutes=1)
-            
-            # Remove old timestamps
-            self.request_timestamps = [
-                ts for ts in self.request_timestamps if ts > cutoff
-            ]
-            
-            # Check if we're at the limit
-            if len(self.request_timestamps) >= self.config.requests_per_minute:
-                # Calculate wait time
-                oldest = self.request_timestamps[0]
-                wait_seconds = 60 - (now - oldest).total_seconds()
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                if len(self.request_timestamps) < self.config.requests_per_minute:
+                    break
                 
-                if wait_seconds > 0:
-                    logger.warning(f"Rate limit reached. Waiting {wait_seconds:.2f}s")
-                    await asyncio.sleep(wait_seconds)
+                wait_seconds = self.WINDOW_SECONDS - (now - self.request_timestamps[0])
+                logger.warning("Rate limit reached. Waiting %.2fs", wait_seconds)
+                await asyncio.sleep(wait_seconds)
             
             # Record this request
-            self.request_timestamps.append(datetime.utcnow())
+            self.request_timestamps.append(now)
+
+
+class SemanticCache:
+    """
+    Similarity-based response cache.
+    
+    Stores prompt embeddings as rows of a single matrix so a lookup is one
+    matrix-vector product followed by an argmax. Entries only match lookups
+    made with the same scope (model and request settings) and expire after
+    `ttl` seconds.
+    """
+    
+    def __init__(
+        self,
+        similarity_threshold: float = 0.92,
+        max_entries: int = 512,
+        ttl: float = 3600,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._embeddings: Optional[np.ndarray] = None
+        self._norms = np.empty(0, dtype=np.float32)
+        self._scopes = np.empty(0, dtype="U32")
+        self._expires = np.empty(0, dtype=np.float64)
+        self._responses: List[str] = []
+    
+    def __len__(self) -> int:
+        return len(self._responses)
+    
+    def get(self, embedding: np.ndarray, scope: str) -> Optional[str]:
+        """Return the cached response closest to `embedding`, if similar enough."""
+        if self._embeddings is None:
+            return None
+        
+        query_norm = np.linalg.norm(embedding)
+        if query_norm == 0:
+            return None
+        
+        scores = (self._embeddings @ embedding) / (self._norms * query_norm)
+        scores[(self._scopes != scope) | (self._expires < time.monotonic())] = -1.0
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity_threshold:
+            return self._responses[best]
+        return None
+    
+    def add(self, embedding: np.ndarray, response: str, scope: str) -> None:
+        """Store a response, evicting the oldest entry when full."""
+        # Index of the oldest entry that survives this insert
+        keep = max(len(self._responses) - self.max_entries + 1, 0)
+        
+        if self._embeddings is None:
+            self._embeddings = embedding[np.newaxis, :]
+        else:
+            self._embeddings = np.vstack([self._embeddings[keep:], embedding])
+        self._norms = np.append(self._norms[keep:], np.linalg.norm(embedding))
+        self._scopes = np.append(self._scopes[keep:], scope)
+        self._expires = np.append(self._expires[keep:], time.monotonic() + self.ttl)
+        self._responses = self._responses[keep:] + [response]
+    
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        self._embeddings = None
+        self._norms = self._norms[:0]
+        self._scopes = self._scopes[:0]
+        self._expires = self._expires[:0]
+        self._responses = []
 
 
 class GeminiClient:
@@ -68,8 +281,9 @@ class GeminiClient:
     - Rate limiting
     - Request validation
     - Structured error handling
-    - Response caching (optional)
+    - Response caching (optional, exact + semantic)
     - Token usage tracking
+    - Per-client HTTP connection pool, opened lazily on first use
     """
     
     # Model configurations
@@ -83,6 +297,13 @@ class GeminiClient:
     MAX_MESSAGE_LENGTH = 100000
     MAX_CONTEXT_LENGTH = 50000
     MAX_PLAN_STEPS = 50
+    SUMMARY_LOG_LINES = 200
+    SUMMARY_LOG_CHARS = 20000  # Keeps the summary prompt under MAX_MESSAGE_LENGTH
+    HEALTH_CHECK_TIMEOUT = 3.0
+    
+    # Caching
+    CACHE_MAX_ENTRIES = 512
+    EMBEDDING_MODEL = "text-embedding-004"
     
     def __init__(
         self,
@@ -91,6 +312,9 @@ class GeminiClient:
         retry_config: Optional[RetryConfig] = None,
         rate_limit_config: Optional[RateLimitConfig] = None,
         enable_caching: bool = False,
+        cache_ttl: float = 3600,
+        enable_semantic_cache: bool = False,
+        similarity_threshold: float = 0.92,
     ):
         """
         Initialize the GeminiClient.
@@ -101,6 +325,10 @@ class GeminiClient:
             retry_config: Configuration for retry behavior
             rate_limit_config: Configuration for rate limiting
             enable_caching: Whether to cache responses
+            cache_ttl: Seconds a cached response stays valid
+            enable_semantic_cache: Whether to also serve cached responses for
+                similar (not just identical) prompts; requires enable_caching
+            similarity_threshold: Minimum cosine similarity for a semantic hit
             
         Raises:
             ValueError: If API key is missing or model is invalid
@@ -121,11 +349,9 @@ class GeminiClient:
         self.model = model
         self.model_config = self.AVAILABLE_MODELS[model]
         
-        # Initialize Google AI client
-        try:
-            self.ai = GoogleGenAI(api_key=self.api_key)
-        except Exception as e:
-            raise ValueError(f"Failed to initialize Google AI client: {e}")
+        # Google AI client and its connection pool, created on first use
+        self._ai: Optional[genai.Client] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
         
         # Setup retry and rate limiting
         self.retry_config = retry_config or RetryConfig()
@@ -133,19 +359,50 @@ class GeminiClient:
         
         # Optional caching
         self.enable_caching = enable_caching
-        self.cache: Dict[str, Any] = {}
+        self.cache_ttl = cache_ttl
+        self.cache: TTLCache = TTLCache(maxsize=self.CACHE_MAX_ENTRIES, ttl=cache_ttl)
+        self.semantic_cache: Optional[SemanticCache] = (
+            SemanticCache(similarity_threshold, self.CACHE_MAX_ENTRIES, cache_ttl)
+            if enable_caching and enable_semantic_cache else None
+        )
         
-        # Usage tracking
+        # Usage tracking (guarded so shared clients stay exact without the GIL)
+        self._stats_lock = threading.Lock()
         self.total_requests = 0
         self.total_tokens = 0
         self.failed_requests = 0
         
         logger.info(
-            f"GeminiClient initialized - Model: {model}, "
-            f"Max tokens: {self.model_config['max_tokens']}, "
-            f"Retry attempts: {self.retry_config.max_attempts}"
+            "GeminiClient initialized - Model: %s, Max tokens: %d, Retry attempts: %d",
+            model,
+            self.model_config['max_tokens'],
+            self.retry_config.max_attempts,
         )
     
+    async def _get_ai(self) -> genai.Client:
+        """
+        Return the Google AI client, creating it and its connection pool on demand.
+        
+        The pool is built on first use, inside the running event loop, and
+        is rebuilt after aclose() so the client can be used again. Requests
+        go through the async surface (client.aio), which is what uses it.
+        
+        Raises:
+            ValueError: If the Google AI client cannot be initialized
+        """
+        if self._ai is None:
+            http_client = httpx.AsyncClient(limits=_HTTPX_LIMITS, http2=True, timeout=30)
+            try:
+                self._ai = genai.Client(
+                    api_key=self.api_key,
+                    http_options=genai_types.HttpOptions(httpx_async_client=http_client),
+                )
+            except Exception as e:
+                await http_client.aclose()
+                raise ValueError(f"Failed to initialize Google AI client: {e}")
+            self._http_client = http_client
+        return self._ai
+    
     async def send_message(
         self,
         message: str,
@@ -153,6 +410,7 @@ class GeminiClient:
         json_mode: bool = False,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
+        config_preset: Optional[Mapping[str, Any]] = None,
     ) -> str:
         """
         Send a message to Gemini with enhanced error handling and validation.
@@ -163,6 +421,8 @@ class GeminiClient:
             json_mode: Whether to request JSON response format
             temperature: Sampling temperature (0.0 to 1.0)
             max_tokens: Maximum tokens in response
+            config_preset: Prebuilt base config; replaces json_mode and
+                temperature (system_instruction still overrides it)
             
         Returns:
             str: Response text from the model
@@ -171,34 +431,31 @@ class GeminiClient:
             ValueError: If inputs are invalid
             RuntimeError: If API call fails after all retries
         """
-        # Validate inputs
-        self._validate_message(message)
-        if system_instruction:
-            self._validate_message(system_instruction, "system_instruction")
-        
-        if not 0.0 <= temperature <= 1.0:
-            raise ValueError("Temperature must be between 0.0 and 1.0")
+        config = self._build_config(
+            system_instruction, json_mode, temperature, max_tokens, config_preset
+        )
         
-        # Check cache
+        # Check cache before validating; only valid requests are ever cached
         if self.enable_caching:
-            cache_key = self._get_cache_key(message, system_instruction, json_mode)
-            if cache_key in self.cache:
+            cache_key = self._get_cache_key(message, config)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
                 logger.debug("Returning cached response")
-                return self.cache[cache_key]
+                return cached
         
-        # Build config
-        config = {
-            "temperature": temperature,
-        }
+        self._validate_request(message, system_instruction, config["temperature"])
         
-        if system_instruction:
-            config["systemInstruction"] = system_instruction
-        
-        if json_mode:
-            config["responseMimeType"] = "application/json"
-        
-        if max_tokens:
-            config["maxOutputTokens"] = min(max_tokens, self.model_config["max_tokens"])
+        # Check semantic cache
+        embedding = None
+        if self.semantic_cache is not None:
+            scope = self._get_cache_key("", config)
+            embedding = await self._embed(message)
+            if embedding is not None:
+                cached = self.semantic_cache.get(embedding, scope)
+                if cached is not None:
+                    logger.debug("Returning semantically cached response")
+                    self.cache[cache_key] = cached
+                    return cached
         
         # Execute with retry
         response_text = await self._execute_with_retry(message, config)
@@ -206,15 +463,146 @@ class GeminiClient:
         # Cache if enabled
         if self.enable_caching:
             self.cache[cache_key] = response_text
+            if embedding is not None:
+                self.semantic_cache.add(embedding, response_text, scope)
         
         return response_text
     
+    async def send_message_stream(
+        self,
+        message: str,
+        system_instruction: Optional[str] = None,
+        json_mode: bool = False,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        config_preset: Optional[Mapping[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response from Gemini chunk by chunk.
+        
+        Takes the same arguments as `send_message`. Retries only cover opening
+        the stream; an error after the first chunk propagates to the caller.
+        
+        Yields:
+            str: Response text chunks in arrival order
+            
+        Raises:
+            ValueError: If inputs are invalid
+            RuntimeError: If the stream cannot be opened after all retries
+        """
+        config = self._build_config(
+            system_instruction, json_mode, temperature, max_tokens, config_preset
+        )
+        
+        # Check cache before validating; only valid requests are ever cached
+        if self.enable_caching:
+            cache_key = self._get_cache_key(message, config)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.debug("Returning cached response")
+                yield cached
+                return
+        
+        self._validate_request(message, system_instruction, config["temperature"])
+        
+        chunks: List[str] = []
+        async for chunk in self._stream_with_retry(message, config):
+            chunks.append(chunk)
+            yield chunk
+        
+        # Cache if enabled
+        if self.enable_caching:
+            self.cache[cache_key] = "".join(chunks)
+    
+    def _validate_request(
+        self,
+        message: str,
+        system_instruction: Optional[str],
+        temperature: float,
+    ) -> None:
+        """Validate request inputs."""
+        self._validate_message(message)
+        if system_instruction:
+            self._validate_message(system_instruction, "system_instruction")
+        
+        if not 0.0 <= temperature <= 1.0:
+            raise ValueError("Temperature must be between 0.0 and 1.0")
+    
+    def _build_config(
+        self,
+        system_instruction: Optional[str],
+        json_mode: bool,
+        temperature: float,
+        max_tokens: Optional[int],
+        config_preset: Optional[Mapping[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Build the generation config for a request."""
+        if config_preset is not None:
+            config = dict(config_preset)
+            if system_instruction:
+                config["system_instruction"] = system_instruction
+        else:
+            config = dict(_build_base_config(temperature, json_mode, system_instruction))
+        
+        if max_tokens:
+            config["max_output_tokens"] = min(max_tokens, self.model_config["max_tokens"])
+        
+        return config
+    
+    async def _embed(self, message: str) -> Optional[np.ndarray]:
+        """Embed a message for semantic cache lookups."""
+        try:
+            ai = await self._get_ai()
+            response = await ai.aio.models.embed_content(
+                model=self.EMBEDDING_MODEL,
+                contents=message,
+            )
+            return np.asarray(response.embeddings[0].values, dtype=np.float32)
+        except Exception as e:
+            logger.warning("Embedding failed, skipping semantic cache: %s", e)
+            return None
+    
     async def _execute_with_retry(
         self,
         message: str,
         config: Dict[str, Any],
     ) -> str:
         """Execute API call with exponential backoff retry."""
+        ai = await self._get_ai()
+        response = await self._call_with_retry(
+            ai.aio.models.generate_content, message, config
+        )
+        self._track_tokens(response)
+        return response.text or ""
+    
+    async def _stream_with_retry(
+        self,
+        message: str,
+        config: Dict[str, Any],
+    ) -> AsyncIterator[str]:
+        """Open a streaming API call with exponential backoff retry."""
+        ai = await self._get_ai()
+        stream = await self._call_with_retry(
+            ai.aio.models.generate_content_stream, message, config
+        )
+        
+        last_chunk = None
+        async for chunk in stream:
+            last_chunk = chunk
+            if chunk.text:
+                yield chunk.text
+        
+        # Usage metadata is cumulative, so the final chunk carries the total
+        if last_chunk is not None:
+            self._track_tokens(last_chunk)
+    
+    async def _call_with_retry(
+        self,
+        method: Callable[..., Awaitable[Any]],
+        message: str,
+        config: Dict[str, Any],
+    ) -> Any:
+        """Call a generation method with rate limiting and retries."""
         last_exception = None
         
         for attempt in range(1, self.retry_config.max_attempts + 1):
@@ -223,46 +611,90 @@ class GeminiClient:
                 await self.rate_limiter.acquire()
                 
                 # Make API call
-                logger.debug(f"API call attempt {attempt}/{self.retry_config.max_attempts}")
-                response = await self.ai.models.generateContent(
+                logger.debug("API call attempt %d/%d", attempt, self.retry_config.max_attempts)
+                response = await method(
                     model=self.model,
                     contents=message,
                     config=config
                 )
                 
-                # Track usage
-                self.total_requests += 1
-                if hasattr(response, 'usage_metadata'):
-                    self.total_tokens += getattr(response.usage_metadata, 'total_tokens', 0)
-                
-                # Return response
-                return response.text or ""
+                with self._stats_lock:
+                    self.total_requests += 1
+                return response
                 
             except Exception as e:
                 last_exception = e
-                logger.warning(f"Attempt {attempt} failed: {str(e)}")
+                logger.warning("Attempt %d failed: %s", attempt, e)
                 
                 # Don't retry on certain errors
                 if self._is_non_retryable_error(e):
-                    logger.error(f"Non-retryable error: {str(e)}")
+                    logger.error("Non-retryable error: %s", e)
                     break
                 
                 # Calculate backoff delay
                 if attempt < self.retry_config.max_attempts:
-                    delay = min(
-                        self.retry_config.base_delay * (self.retry_config.exponential_base ** (attempt - 1)),
-                        self.retry_config.max_delay
-                    )
-                    logger.info(f"Retrying in {delay:.2f}s...")
+                    delay = self._get_retry_delay(e, attempt)
+                    if delay is None:
+                        logger.error(
+                            "Server asked to wait longer than %.0fs, not retrying",
+                            self.retry_config.max_delay
+                        )
+                        break
+                    logger.info("Retrying in %.2fs...", delay)
                     await asyncio.sleep(delay)
         
         # All retries failed
-        self.failed_requests += 1
+        with self._stats_lock:
+            self.failed_requests += 1
         raise RuntimeError(
-            f"API call failed after {self.retry_config.max_attempts} attempts. "
+            f"API call failed after {attempt} attempts. "
             f"Last error: {str(last_exception)}"
         )
     
+    def _get_retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Compute how long to wait before the next attempt.
+        
+        A server-provided Retry-After is honored, with a little jitter on top
+        so concurrent callers do not return in lockstep. If it exceeds
+        max_delay, None is returned and the call is not retried; retrying
+        sooner would only be rejected again. Otherwise the exponential
+        backoff is fully jittered and capped at max_delay.
+        """
+        retry_after = self._get_retry_after(error)
+        if retry_after is not None:
+            if retry_after > self.retry_config.max_delay:
+                return None
+            return retry_after + random.uniform(0, self.retry_config.base_delay)
+        
+        delay = min(
+            self.retry_config.base_delay * (self.retry_config.exponential_base ** (attempt - 1)),
+            self.retry_config.max_delay
+        )
+        return random.uniform(0, delay)
+    
+    @staticmethod
+    def _get_retry_after(error: Exception) -> Optional[float]:
+        """Extract a Retry-After delay in seconds from an API error, if any."""
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is None:
+            headers = getattr(getattr(error, 'response', None), 'headers', None)
+            if headers is not None:
+                retry_after = headers.get('Retry-After')
+        
+        try:
+            return max(float(retry_after), 0.0) if retry_after is not None else None
+        except (TypeError, ValueError):
+            # HTTP-date form is not worth parsing here
+            return None
+    
+    def _track_tokens(self, response: Any) -> None:
+        """Add a response's token usage to the running total."""
+        if hasattr(response, 'usage_metadata'):
+            tokens = getattr(response.usage_metadata, 'total_token_count', None) or 0
+            with self._stats_lock:
+                self.total_tokens += tokens
+    
     async def create_plan(
         self,
         task: str,
@@ -297,68 +729,39 @@ class GeminiClient:
         # Build enhanced prompt
         context_str = f"Context: {context}" if context else "Context: Standard execution environment"
         
-        prompt = f"""Create a detailed step-by-step technical execution plan for the following task:
-
-TASK: {task}
-
-{context_str}
-
-Requirements:
-- Break down the task into clear, actionable steps
-- Each step should have specific commands where applicable
-- Include expected outcomes for verification
-- Maximum {max_steps} steps
-- Consider dependencies between steps
-"""
-        
-        system_instruction = """You are Celia AI Agent, an expert in technical planning and execution.
-
-Respond ONLY with a valid JSON array. Each object must have this exact structure:
-{
-    "step_number": <integer>,
-    "action": "<clear description of what to do>",
-    "expected_outcome": "<measurable result>",
-    "commands": ["<command1>", "<command2>"],
-    "estimated_time": "<e.g., '2 minutes'>",
-    "dependencies": [<step_numbers this depends on>]
-}
-
-Ensure:
-- Commands are safe and executable
-- No destructive operations without explicit confirmation
-- Steps are in logical order
-- Each step builds on previous ones"""
+        prompt = _PLAN_PROMPT_TMPL.format(
+            task=task,
+            context_str=context_str,
+            max_steps=max_steps,
+        )
         
         try:
             response_text = await self.send_message(
                 message=prompt,
-                system_instruction=system_instruction,
-                json_mode=True,
-                temperature=0.3,  # Lower temperature for more consistent planning
+                config_preset=_PLAN_CONFIG,
             )
             
-            # Parse and validate
-            plan = json.loads(response_text)
-            
-            if not isinstance(plan, list):
-                raise ValueError("Plan must be a JSON array")
+            # Steps are validated one by one so a single malformed step
+            # does not discard the rest of the plan
+            steps = msgspec.json.decode(response_text, type=List[Any])
+            plan = self._plan_to_dicts(steps)
+            if not plan:
+                logger.error("Plan contained no valid steps")
+                return self._get_fallback_plan(task)
             
-            # Validate structure
-            validated_plan = self._validate_plan(plan)
+            logger.info("Generated plan with %d steps", len(plan))
+            return plan
             
-            logger.info(f"Generated plan with {len(validated_plan)} steps")
-            return validated_plan
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse plan JSON: {e}")
+        except msgspec.DecodeError as e:
+            logger.error("Failed to parse plan JSON: %s", e)
             return self._get_fallback_plan(task)
         except Exception as e:
-            logger.error(f"Plan creation failed: {e}")
+            logger.error("Plan creation failed: %s", e)
             return self._get_fallback_plan(task)
     
     async def summarize_results(
         self,
-        logs: str,
+        logs: Iterable[str],
         files: List[str],
         execution_time: Optional[float] = None,
         status: str = "completed",
@@ -367,7 +770,8 @@ Ensure:
         Generate a professional summary of execution results.
         
         Args:
-            logs: Execution logs
+            logs: Execution log lines, oldest first (only the most recent
+                SUMMARY_LOG_LINES are used)
             files: List of generated files
             execution_time: Total execution time in seconds
             status: Execution status
@@ -375,51 +779,78 @@ Ensure:
         Returns:
             Formatted summary text
         """
-        # Truncate logs intelligently
-        truncated_logs = self._truncate_logs(logs, max_length=2000)
-        
-        # Build comprehensive prompt
-        time_str = f"\nExecution time: {execution_time:.2f} seconds" if execution_time else ""
-        
-        prompt = f"""Analyze the following execution results and create a professional summary:
-
-STATUS: {status}
-{time_str}
-
-GENERATED FILES:
-{self._format_file_list(files)}
-
-EXECUTION LOGS (last 2000 chars):
-```
-{truncated_logs}
-```
-
-Provide a summary with:
-1. Overall execution status and success
-2. Key accomplishments
-3. Files generated and their purposes
-4. Any warnings or issues encountered
-5. Next steps or recommendations"""
-        
-        system_instruction = """You are a technical report writer. Create clear, professional summaries that:
-- Use active voice
-- Highlight key results
-- Identify any issues or warnings
-- Provide actionable insights
-- Are concise but comprehensive"""
+        logs = deque(logs, maxlen=self.SUMMARY_LOG_LINES)
+        prompt = self._build_summary_prompt(logs, files, execution_time, status)
         
         try:
             summary = await self.send_message(
                 message=prompt,
-                system_instruction=system_instruction,
-                temperature=0.5,
+                config_preset=_SUMMARY_CONFIG,
             )
             return summary
             
         except Exception as e:
-            logger.error(f"Summary generation failed: {e}")
+            logger.error("Summary generation failed: %s", e)
             return self._get_fallback_summary(logs, files, status)
     
+    async def summarize_results_stream(
+        self,
+        logs: Iterable[str],
+        files: List[str],
+        execution_time: Optional[float] = None,
+        status: str = "completed",
+    ) -> AsyncIterator[str]:
+        """
+        Stream a professional summary of execution results.
+        
+        Takes the same arguments as `summarize_results`. Falls back to the
+        basic summary if the stream fails before producing any output.
+        
+        Yields:
+            str: Summary text chunks
+        """
+        logs = deque(logs, maxlen=self.SUMMARY_LOG_LINES)
+        prompt = self._build_summary_prompt(logs, files, execution_time, status)
+        
+        started = False
+        try:
+            async for chunk in self.send_message_stream(
+                message=prompt,
+                config_preset=_SUMMARY_CONFIG,
+            ):
+                started = True
+                yield chunk
+                
+        except Exception as e:
+            logger.error("Summary generation failed: %s", e)
+            if started:
+                yield "\n\n*Note: AI summary was interrupted before completion.*\n"
+            else:
+                yield self._get_fallback_summary(logs, files, status)
+    
+    def _build_summary_prompt(
+        self,
+        logs: Iterable[str],
+        files: List[str],
+        execution_time: Optional[float],
+        status: str,
+    ) -> str:
+        """Build the summary prompt."""
+        # Build comprehensive prompt
+        time_str = f"\nExecution time: {execution_time:.2f} seconds" if execution_time else ""
+        
+        # Lines can be up to MAX_LOG_SIZE long, so bound the total as well
+        log_text = "\n".join(logs)
+        if len(log_text) > self.SUMMARY_LOG_CHARS:
+            log_text = "... [earlier logs truncated]\n" + log_text[-self.SUMMARY_LOG_CHARS:]
+        
+        return _SUMMARY_PROMPT_TMPL.format(
+            status=status,
+            time_str=time_str,
+            files=self._format_file_list(files),
+            logs=log_text,
+        )
+    
     def _validate_message(self, message: str, param_name: str = "message") -> None:
         """Validate message content."""
         if not message or not message.strip():
@@ -431,40 +862,35 @@ Provide a summary with:
                 f"Maximum: {self.MAX_MESSAGE_LENGTH}"
             )
     
-    def _validate_plan(self, plan: List[Dict]) -> List[Dict[str, Any]]:
-        """Validate and sanitize plan structure."""
-        validated = []
+    def _plan_to_dicts(self, steps: List[Any]) -> List[Dict[str, Any]]:
+        """Validate raw plan steps into dicts, dropping invalid ones and capping the step count."""
+        plan = []
         
-        for i, step in enumerate(plan[:self.MAX_PLAN_STEPS], 1):
-            if not isinstance(step, dict):
-                logger.warning(f"Step {i} is not a dictionary, skipping")
+        for raw_step in steps:
+            if len(plan) >= self.MAX_PLAN_STEPS:
+                break
+            try:
+                step = msgspec.convert(raw_step, PlanStep, strict=False)
+            except msgspec.ValidationError as e:
+                logger.warning("Dropping invalid plan step: %s", e)
                 continue
             
-            validated_step = {
-                "step_number": step.get("step_number", i),
-                "action": str(step.get("action", "Undefined action")),
-                "expected_outcome": str(step.get("expected_outcome", "N/A")),
-                "commands": [str(cmd) for cmd in step.get("commands", [])],
-            }
-            
-            # Optional fields
-            if "estimated_time" in step:
-                validated_step["estimated_time"] = str(step["estimated_time"])
+            if step.step_number is None:
+                step.step_number = len(plan) + 1
+            if step.commands is None:
+                step.commands = []
+            # Models sometimes give a bare number of minutes or null commands
+            if isinstance(step.estimated_time, (int, float)):
+                step.estimated_time = f"{step.estimated_time:g} minutes"
             
-            if "dependencies" in step and isinstance(step["dependencies"], list):
-                validated_step["dependencies"] = [int(d) for d in step["dependencies"]]
-            
-            validated.append(validated_step)
-        
-        return validated
-    
-    def _truncate_logs(self, logs: str, max_length: int = 2000) -> str:
-        """Intelligently truncate logs to show most relevant parts."""
-        if len(logs) <= max_length:
-            return logs
+            # Optional fields are left out when the model did not provide them
+            plan.append({
+                field: getattr(step, field)
+                for field in step.__struct_fields__
+                if getattr(step, field) is not None
+            })
         
-        # Take last portion (most recent logs)
-        return "... [earlier logs truncated]\n" + logs[-max_length:]
+        return plan
     
     def _format_file_list(self, files: List[str]) -> str:
         """Format file list for display."""
@@ -485,11 +911,13 @@ Provide a summary with:
     
     def _get_fallback_summary(
         self,
-        logs: str,
+        logs: Iterable[str],
         files: List[str],
         status: str,
     ) -> str:
         """Generate basic summary if AI generation fails."""
+        recent_logs = "\n".join(logs)[-500:]
+        
         return f"""# Execution Summary
 
 **Status**: {status}
@@ -499,7 +927,7 @@ Provide a summary with:
 
 **Logs** (last 500 chars):
 ```
-{logs[-500:]}
+{recent_logs}
 ```
 
 *Note: Detailed AI summary generation failed. This is a basic fallback summary.*
@@ -508,27 +936,26 @@ Provide a summary with:
     def _get_cache_key(
         self,
         message: str,
-        system_instruction: Optional[str],
-        json_mode: bool,
+        config: Dict[str, Any],
     ) -> str:
         """Generate cache key for a request."""
-        import hashlib
-        
-        cache_str = f"{message}|{system_instruction or ''}|{json_mode}"
-        return hashlib.md5(cache_str.encode()).hexdigest()
+        payload = orjson.dumps(
+            {"model": self.model, "config": config, "m": message},
+            option=orjson.OPT_SORT_KEYS,
+        )
+        return blake2b(payload, digest_size=16).hexdigest()
     
     def _is_non_retryable_error(self, error: Exception) -> bool:
         """Check if an error should not be retried."""
-        error_str = str(error).lower()
+        # 4xx responses mean the request itself is wrong, except for
+        # timeouts and rate limiting
+        if isinstance(error, genai_errors.ClientError):
+            return error.code not in _RETRYABLE_CLIENT_CODES
+        if isinstance(error, genai_errors.APIError):
+            return False
         
-        non_retryable = [
-            "invalid api key",
-            "authentication failed",
-            "invalid model",
-            "content policy violation",
-        ]
-        
-        return any(msg in error_str for msg in non_retryable)
+        # Unknown exception types: fall back to matching the message
+        return bool(_NON_RETRYABLE_RE.search(str(error)))
     
     def get_usage_stats(self) -> Dict[str, Any]:
         """
@@ -537,36 +964,66 @@ Provide a summary with:
         Returns:
             Dictionary with usage metrics
         """
+        with self._stats_lock:
+            total_requests = self.total_requests
+            failed_requests = self.failed_requests
+            total_tokens = self.total_tokens
+        
         return {
-            "total_requests": self.total_requests,
-            "failed_requests": self.failed_requests,
+            "total_requests": total_requests,
+            "failed_requests": failed_requests,
             "success_rate": (
-                (self.total_requests - self.failed_requests) / self.total_requests * 100
-                if self.total_requests > 0 else 0
+                (total_requests - failed_requests) / total_requests * 100
+                if total_requests > 0 else 0
             ),
-            "total_tokens": self.total_tokens,
+            "total_tokens": total_tokens,
             "cached_responses": len(self.cache) if self.enable_caching else 0,
         }
     
     def clear_cache(self) -> None:
         """Clear the response cache."""
         self.cache.clear()
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
         logger.info("Response cache cleared")
     
+    async def aclose(self) -> None:
+        """
+        Close this client's HTTP connection pool.
+        
+        A later request opens a new pool, so the client stays usable.
+        """
+        http_client, self._http_client, self._ai = self._http_client, None, None
+        if http_client is not None and not http_client.is_closed:
+            await http_client.aclose()
+            logger.info("HTTP connection pool closed")
+    
     async def health_check(self) -> bool:
         """
         Perform a health check on the API connection.
         
+        Makes a single direct call bounded by HEALTH_CHECK_TIMEOUT, bypassing
+        the cache, rate limiter and retries so probes stay fast and do not
+        consume request budget.
+        
         Returns:
             bool: True if API is accessible, False otherwise
         """
         try:
-            response = await self.send_message(
-                message="ping",
-                temperature=0,
+            ai = await self._get_ai()
+            await asyncio.wait_for(
+                ai.aio.models.generate_content(
+                    model=self.model,
+                    contents="ping",
+                    config=dict(_HEALTH_CONFIG),
+                ),
+                timeout=self.HEALTH_CHECK_TIMEOUT,
             )
             logger.info("Health check passed")
             return True
+        except asyncio.TimeoutError:
+            logger.error("Health check timed out after %.1fs", self.HEALTH_CHECK_TIMEOUT)
+            return False
         except Exception as e:
-            logger.error(f"Health check failed: {e}")
+            logger.error("Health check failed: %s", e)
             return False
\ No newline at end of file
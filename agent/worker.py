@@ -1,16 +1,63 @@
 import os
-import uuid
+import re
+import secrets
+import sqlite3
 import logging
 import asyncio
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Deque
+from collections import defaultdict, deque
 from pathlib import Path
 from datetime import datetime
+from string import Template
+
+import aiofiles
 
 from api.database import Database
 from agent.gemini_client import GeminiClient
 
 logger = logging.getLogger(__name__)
 
+# Final report layout; the streamed summary is written between the two parts
+_REPORT_HEADER_TMPL = Template("""# CELIA AI AGENT EXECUTION REPORT
+
+**Job ID**: `$job_id`  
+**Generated**: $timestamp  
+**Status**: $status
+
+---
+
+## Task Description
+$task
+
+## Repository
+$repo_url
+
+---
+
+## Executive Summary
+""")
+
+_REPORT_FOOTER_TMPL = Template("""
+
+---
+
+## Execution Logs
+```
+$logs
+```
+
+---
+
+## Artifacts Generated
+$files
+
+---
+
+*Report generated by Celia AI Agent v2.5*
+""")
+
+_NO_FILES_TEXT = "No files generated"
+
 
 class AgentWorker:
     """
@@ -27,13 +74,27 @@ class AgentWorker:
     # Configuration constants
     MAX_EXECUTION_TIME = 3600  # 1 hour max per job
     MAX_LOG_SIZE = 10000  # Max characters per log entry
+    CLONE_TIMEOUT = 300  # Max seconds for git clone
+    JOB_ID_ATTEMPTS = 5  # Retries on job ID collision
+    RECENT_LOG_LINES = 200  # Log lines kept in memory per running job
+    LOG_FLUSH_INTERVAL = 0.5  # Max seconds a log line waits before being written
+    LOG_FLUSH_LINES = 50  # Buffered lines per job that trigger an early flush
+    REPORT_LOG_LINES = 50  # Most recent log lines included in the report
+    REPORT_SYNC_BYTES = 64 * 1024  # Reports at least this large are fsynced
     ALLOWED_SCHEMES = ['https', 'http', 'git']
+    _SCHEME_RE = re.compile(rf"^(?:{'|'.join(ALLOWED_SCHEMES)})://", re.IGNORECASE)
+    _BLOCKED_RE = re.compile(r'file://|^/', re.IGNORECASE)
+    # secrets.token_hex(6) IDs, plus the 8-character IDs of older jobs
+    _JOB_ID_RE = re.compile(r'^[0-9a-f]{8}(?:[0-9a-f]{4})?$')
     
     def __init__(
         self, 
         database: Database,
         jobs_base_dir: Optional[Path] = None,
-        max_concurrent_jobs: int = 5
+        max_concurrent_jobs: int = 5,
+        gemini: Optional[GeminiClient] = None,
+        simulate: bool = False,
+        max_running_jobs: int = 20
     ):
         """
         Initialize the AgentWorker.
@@ -41,33 +102,56 @@ class AgentWorker:
         Args:
             database: Database instance for job persistence
             jobs_base_dir: Base directory for job workspaces
-            max_concurrent_jobs: Maximum number of concurrent jobs
+            max_concurrent_jobs: Maximum number of jobs talking to Gemini at once
+            gemini: Shared GeminiClient (a new one is created if omitted)
+            simulate: Pace plan execution with artificial delays (for demos)
+            max_running_jobs: Maximum number of jobs executing at once; bounds
+                clones and command execution, and queued jobs do not use up
+                their execution time
         """
         self.db = database
-        self.gemini = GeminiClient()
+        self.gemini = gemini or GeminiClient()
         self.jobs_base_dir = jobs_base_dir or Path("jobs")
         self.jobs_base_dir.mkdir(exist_ok=True, parents=True)
+        # Held only around Gemini calls, so jobs waiting on I/O do not
+        # occupy a slot
         self.semaphore = asyncio.Semaphore(max_concurrent_jobs)
+        self.job_slots = asyncio.Semaphore(max_running_jobs)
+        self.simulate = simulate
+        
+        # Log lines waiting to be written to the database
+        self._log_buffers: Dict[str, List[str]] = defaultdict(list)
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_now = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        
+        # Most recent log lines per running job, fed to the summary prompt
+        self._recent_logs: Dict[str, Deque[str]] = defaultdict(
+            lambda: deque(maxlen=self.RECENT_LOG_LINES)
+        )
         
         logger.info(
             f"AgentWorker initialized - Base dir: {self.jobs_base_dir}, "
-            f"Max concurrent: {max_concurrent_jobs}"
+            f"Max concurrent: {max_concurrent_jobs}, Max running: {max_running_jobs}"
         )
     
-    def create_job(
+    async def create_job(
         self, 
         task: str, 
         repo_url: Optional[str] = None
-    ) -> str:
+    ) -> Dict[str, Any]:
         """
         Create a new job with validated inputs.
         
+        Database and filesystem work runs in a worker thread so the event
+        loop keeps serving other requests.
+        
         Args:
             task: Description of the task to execute
             repo_url: Optional repository URL to clone
             
         Returns:
-            str: Generated job ID
+            Dict with the new job's job_id, status and created_at
             
         Raises:
             ValueError: If inputs are invalid
@@ -83,20 +167,32 @@ class AgentWorker:
         if repo_url:
             self._validate_repo_url(repo_url)
         
-        # Generate unique job ID
-        job_id = str(uuid.uuid4())[:8]
-        
-        # Create database entry
-        self.db.create_job(job_id, task.strip(), repo_url)
+        # Generate unique job ID and create database entry; the primary key
+        # rejects the rare collision, so just draw a new ID
+        for _ in range(self.JOB_ID_ATTEMPTS):
+            job_id = secrets.token_hex(6)
+            try:
+                job = await self.db.acreate_job(job_id, task.strip(), repo_url)
+                break
+            except sqlite3.IntegrityError:
+                logger.warning(f"Job ID collision on {job_id}, retrying")
+        else:
+            raise RuntimeError(
+                f"Could not allocate a unique job ID after {self.JOB_ID_ATTEMPTS} attempts"
+            )
         
         # Setup job workspace
-        job_dir = self.jobs_base_dir / job_id
-        job_dir.mkdir(exist_ok=True, parents=True)
-        (job_dir / "output").mkdir(exist_ok=True, parents=True)
-        (job_dir / "workspace").mkdir(exist_ok=True, parents=True)
+        await asyncio.to_thread(self._create_workspace, job_id)
         
         logger.info(f"Job {job_id} created - Task: {task[:100]}...")
-        return job_id
+        return job
+    
+    def _create_workspace(self, job_id: str) -> None:
+        """Create the on-disk workspace for a job."""
+        # makedirs creates the job directory along with the first subdirectory
+        job_dir = self.jobs_base_dir / job_id
+        os.makedirs(job_dir / "output", exist_ok=True)
+        os.makedirs(job_dir / "workspace", exist_ok=True)
     
     async def execute_job(self, job_id: str) -> None:
         """
@@ -105,7 +201,9 @@ class AgentWorker:
         Args:
             job_id: The job identifier
         """
-        async with self.semaphore:  # Limit concurrent executions
+        # The job stays pending while it waits for a slot; the execution
+        # timeout only starts once it runs
+        async with self.job_slots:
             start_time = datetime.utcnow()
             
             try:
@@ -116,26 +214,42 @@ class AgentWorker:
             except asyncio.TimeoutError:
                 error_msg = f"Job execution timeout after {self.MAX_EXECUTION_TIME}s"
                 logger.error(f"Job {job_id}: {error_msg}")
-                self.db.set_error(job_id, error_msg)
+                await self._flush_logs(job_id)
+                await self.db.aset_error(job_id, error_msg)
             except Exception as e:
                 error_msg = f"Unexpected error: {str(e)}"
                 logger.exception(f"Job {job_id} failed: {error_msg}")
-                self.db.set_error(job_id, error_msg)
+                await self._flush_logs(job_id)
+                await self.db.aset_error(job_id, error_msg)
             finally:
+                await self._flush_logs(job_id)
+                self._recent_logs.pop(job_id, None)
                 duration = (datetime.utcnow() - start_time).total_seconds()
                 logger.info(f"Job {job_id} finished in {duration:.2f}s")
     
+    async def execute_jobs(self, job_ids: List[str]) -> None:
+        """
+        Execute several jobs concurrently.
+        
+        At most max_running_jobs run at a time; Gemini calls are further
+        bounded by the worker semaphore and the shared client's rate limiter.
+        
+        Args:
+            job_ids: The job identifiers
+        """
+        await asyncio.gather(*(self.execute_job(job_id) for job_id in job_ids))
+    
     async def _execute_job_internal(self, job_id: str) -> None:
         """Internal job execution logic."""
         logger.info(f"Starting execution for job {job_id}")
-        self.db.update_job_status(job_id, "running")
+        await self.db.aupdate_job_status(job_id, "running")
         self._log(
             job_id, 
             "[SYSTEM] Celia Engine v2.5 initialized. Production security protocols active."
         )
         
         # Fetch job details
-        job = self.db.get_job(job_id)
+        job = await self.db.aget_job(job_id)
         if not job:
             raise ValueError(f"Job {job_id} not found in database")
         
@@ -161,7 +275,7 @@ class AgentWorker:
         await self._generate_report(job_id, job)
         
         # Mark as complete
-        self.db.update_job_status(job_id, "completed")
+        await self.db.aupdate_job_status(job_id, "completed")
         self._log(job_id, "[SUCCESS] All objectives verified. Artifacts ready.")
         logger.info(f"Job {job_id} completed successfully")
     
@@ -173,7 +287,8 @@ class AgentWorker:
     ) -> List[Dict[str, Any]]:
         """Create execution plan using Gemini."""
         try:
-            plan = await self.gemini.create_plan(task, context=context)
+            async with self.semaphore:
+                plan = await self.gemini.create_plan(task, context=context)
             self._log(job_id, f"[PLAN] Generated {len(plan)} execution steps")
             return plan
         except Exception as e:
@@ -200,114 +315,131 @@ class AgentWorker:
             self._log(job_id, f"[STEP {step_num}] {action}")
             self._log(job_id, f"[EXPECTED] {expected}")
             
-            # Execute commands (simulation for now)
+            # Commands are ordered shell steps unless the plan explicitly
+            # marks them as independent
             commands = step.get('commands', [])
-            for cmd in commands:
-                # Sanitize command for logging
-                safe_cmd = cmd[:200] if len(cmd) > 200 else cmd
-                self._log(job_id, f"[CMD] $ {safe_cmd}")
-                await asyncio.sleep(0.5)  # Simulate execution
+            if step.get('parallel_commands') is True:
+                await asyncio.gather(
+                    *(self._exec_one_command(job_id, cmd) for cmd in commands)
+                )
+            else:
+                for cmd in commands:
+                    await self._exec_one_command(job_id, cmd)
             
-            await asyncio.sleep(1)  # Reasoning delay
+            if self.simulate:
+                await asyncio.sleep(1)  # Reasoning delay
+    
+    async def _exec_one_command(self, job_id: str, cmd: str) -> None:
+        """Execute a single plan command (logged only for now)."""
+        # Sanitize command for logging
+        safe_cmd = cmd[:200] if len(cmd) > 200 else cmd
+        self._log(job_id, f"[CMD] $ {safe_cmd}")
+        if self.simulate:
+            await asyncio.sleep(0.5)  # Simulate execution
     
     async def _generate_report(
         self, 
         job_id: str, 
         job: Dict[str, Any]
     ) -> None:
-        """Generate final execution report."""
+        """Generate final execution report, streaming the summary to disk."""
         output_dir = self.jobs_base_dir / job_id / "output"
-        output_dir.mkdir(exist_ok=True, parents=True)
+        await asyncio.to_thread(output_dir.mkdir, exist_ok=True, parents=True)
         
-        # Get summary from Gemini
-        logs = job.get('logs', '')
+        logs = self._recent_logs.get(job_id, ())
         files = job.get('files', [])
         
-        summary = await self.gemini.summarize_results(logs, files)
-        
         # Create report
         report_path = output_dir / "CELIA_FINAL_REPORT.md"
-        report_content = self._format_report(job_id, job, summary)
         
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write(report_content)
+        # Written as UTF-8 bytes so the size compares with REPORT_SYNC_BYTES
+        async with aiofiles.open(report_path, 'wb') as f:
+            written = await f.write(self._format_report_header(job_id, job).encode())
+            async with self.semaphore:
+                async for chunk in self.gemini.summarize_results_stream(logs, files):
+                    written += await f.write(chunk.encode())
+            
+            # Only the tail of the log is shown, so fetch just that
+            await self._flush_logs(job_id)
+            log_tail = await self.db.aget_log_tail(job_id, self.REPORT_LOG_LINES)
+            written += await f.write(self._format_report_footer(job, log_tail).encode())
+            
+            # Push large reports to disk now rather than leaving them to
+            # background writeback at an unpredictable later point
+            if written >= self.REPORT_SYNC_BYTES:
+                await f.flush()
+                await asyncio.to_thread(os.fsync, f.fileno())
         
-        self.db.add_file(job_id, str(report_path.name))
+        await self.db.aadd_file(job_id, str(report_path.name))
         self._log(job_id, f"[REPORT] Generated at {report_path.name}")
     
-    def _format_report(
+    def _format_report_header(
         self, 
         job_id: str, 
-        job: Dict[str, Any], 
-        summary: str
+        job: Dict[str, Any]
     ) -> str:
-        """Format the final report content."""
-        timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
-        
-        return f"""# CELIA AI AGENT EXECUTION REPORT
-
-**Job ID**: `{job_id}`  
-**Generated**: {timestamp}  
-**Status**: {job.get('status', 'unknown')}
-
----
-
-## Task Description
-{job.get('task', 'N/A')}
-
-## Repository
-{job.get('repo_url', 'None')}
-
----
-
-## Executive Summary
-{summary}
-
----
-
-## Execution Logs
-```
-{job.get('logs', 'No logs available')[-2000:]}
-```
-
----
-
-## Artifacts Generated
-{self._format_files_list(job.get('files', []))}
-
----
-
-*Report generated by Celia AI Agent v2.5*
-"""
+        """Format the report content that precedes the summary."""
+        return _REPORT_HEADER_TMPL.substitute(
+            job_id=job_id,
+            timestamp=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC'),
+            status=job.get('status', 'unknown'),
+            task=job.get('task', 'N/A'),
+            repo_url=job.get('repo_url', 'None'),
+        )
+    
+    def _format_report_footer(self, job: Dict[str, Any], log_tail: str) -> str:
+        """Format the report content that follows the summary."""
+        files = job.get('files')
+        return _REPORT_FOOTER_TMPL.substitute(
+            logs=log_tail or 'No logs available',
+            files=self._format_files_list(files) if files else _NO_FILES_TEXT,
+        )
     
     def _format_files_list(self, files: List[str]) -> str:
         """Format the files list for the report."""
         if not files:
-            return "No files generated"
+            return _NO_FILES_TEXT
         
         return "\n".join(f"- `{file}`" for file in files)
     
     async def _clone_repository(self, job_id: str, repo_url: str) -> None:
         """
-        Clone repository to workspace (currently simulated).
+        Shallow-clone the repository into the job workspace.
         
-        In production, this would use subprocess with proper security:
-        - Timeout controls
-        - Resource limits
-        - Sandboxed environment
+        Raises:
+            RuntimeError: If git fails or exceeds CLONE_TIMEOUT
         """
         self._log(job_id, f"[GIT] Synchronizing workspace with: {repo_url}")
         
-        # TODO: Implement actual git clone with security controls
-        # Example:
-        # workspace = self.jobs_base_dir / job_id / "workspace"
-        # await asyncio.create_subprocess_exec(
-        #     'git', 'clone', '--depth', '1', repo_url, str(workspace),
-        #     stdout=asyncio.subprocess.PIPE,
-        #     stderr=asyncio.subprocess.PIPE
-        # )
+        workspace = self.jobs_base_dir / job_id / "workspace"
+        # checkout.workers=0 lets git write the checkout with one worker per
+        # CPU (git 2.32+; older versions ignore the setting)
+        process = await asyncio.create_subprocess_exec(
+            'git', '-c', 'checkout.workers=0',
+            'clone', '--depth', '1', '--', repo_url, str(workspace),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            env={**os.environ, 'GIT_TERMINAL_PROMPT': '0'},
+        )
+        
+        try:
+            _, stderr = await asyncio.wait_for(
+                process.communicate(),
+                timeout=self.CLONE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"git clone timed out after {self.CLONE_TIMEOUT}s")
+        finally:
+            # Also reached when the job itself is cancelled (execution timeout
+            # or shutdown); git must not keep writing into the workspace
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+        
+        if process.returncode != 0:
+            error = stderr.decode(errors='replace').strip()
+            raise RuntimeError(f"git clone failed: {error[-500:]}")
         
-        await asyncio.sleep(1.5)  # Simulate clone time
         self._log(job_id, "[GIT] Repository cloned. Workspace verified.")
     
     def _validate_repo_url(self, url: str) -> None:
@@ -315,16 +447,14 @@ class AgentWorker:
         if not url or not url.strip():
             raise ValueError("Repository URL cannot be empty")
         
-        url_lower = url.lower()
-        
         # Check for allowed schemes
-        if not any(url_lower.startswith(f"{scheme}://") for scheme in self.ALLOWED_SCHEMES):
+        if not self._SCHEME_RE.match(url):
             raise ValueError(
                 f"Invalid URL scheme. Allowed: {', '.join(self.ALLOWED_SCHEMES)}"
             )
         
         # Block local file access
-        if 'file://' in url_lower or url_lower.startswith('/'):
+        if self._BLOCKED_RE.search(url):
             raise ValueError("Local file access not allowed")
         
         # Basic length check
@@ -335,34 +465,135 @@ class AgentWorker:
         """
         Add a log entry with size control.
         
+        The entry is buffered and written to the database in batches.
+        
         Args:
             job_id: Job identifier
             message: Log message
         """
         # Truncate if too long
-        if len(message) > self.MAX_LOG_SIZE:
-            message = message[:self.MAX_LOG_SIZE] + "... [TRUNCATED]"
+        msg = (
+            message if len(message) <= self.MAX_LOG_SIZE
+            else message[:self.MAX_LOG_SIZE] + "... [TRUNCATED]"
+        )
+        
+        self._log_buffers[job_id].append(msg)
+        self._recent_logs[job_id].append(msg)
+        logger.debug(f"Job {job_id}: {msg}")
+        
+        # Buffered lines are written by a background task started on demand
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        if len(self._log_buffers[job_id]) >= self.LOG_FLUSH_LINES:
+            self._flush_now.set()
+    
+    async def _flush_loop(self) -> None:
+        """Write buffered log lines every LOG_FLUSH_INTERVAL until idle."""
+        while self._log_buffers:
+            try:
+                await asyncio.wait_for(
+                    self._flush_now.wait(),
+                    timeout=self.LOG_FLUSH_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            
+            try:
+                await self._flush_logs()
+            except Exception as e:
+                logger.error(f"Failed to flush job logs: {e}")
+    
+    async def _flush_logs(self, job_id: Optional[str] = None) -> None:
+        """
+        Write buffered log lines to the database, one statement per job.
         
-        self.db.append_log(job_id, message)
-        logger.debug(f"Job {job_id}: {message}")
+        Args:
+            job_id: Only flush this job (all jobs if omitted)
+        """
+        # Serialized so a later batch can never be written before an
+        # earlier one that is still in flight
+        async with self._flush_lock:
+            job_ids = [job_id] if job_id else list(self._log_buffers)
+            for pending_id in job_ids:
+                lines = self._log_buffers.pop(pending_id, None)
+                if lines:
+                    # Cancelling a queued to_thread call drops the write, and
+                    # these lines are no longer buffered, so let it finish
+                    # (still under the lock) before passing the cancel on
+                    write = asyncio.ensure_future(self.db.aappend_logs(pending_id, lines))
+                    try:
+                        await asyncio.shield(write)
+                    except asyncio.CancelledError:
+                        await write
+                        raise
+    
+    async def aclose(self) -> None:
+        """Stop the log flusher and write any remaining buffered lines."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await self._flush_logs()
     
-    def cleanup_job(self, job_id: str) -> None:
+    async def cleanup_job(self, job_id: str) -> None:
         """
         Clean up job workspace and resources.
         
+        The directory tree is removed in a worker thread so deleting a large
+        cloned repository does not block the event loop.
+        
         Args:
             job_id: Job identifier
+            
+        Raises:
+            ValueError: If job_id is not a valid job ID or does not name a
+                directory directly inside jobs_base_dir
         """
-        job_dir = self.jobs_base_dir / job_id
+        if not self._JOB_ID_RE.match(job_id):
+            raise ValueError(f"Invalid job ID: {job_id!r}")
+        
+        base_dir = self.jobs_base_dir.resolve()
+        job_dir = (base_dir / job_id).resolve()
+        if job_dir.parent != base_dir:
+            raise ValueError(f"Job directory escapes the jobs directory: {job_id!r}")
         
         if job_dir.exists():
             try:
-                import shutil
-                shutil.rmtree(job_dir)
+                await asyncio.to_thread(self._rmtree_fast, str(job_dir))
                 logger.info(f"Cleaned up workspace for job {job_id}")
             except Exception as e:
                 logger.error(f"Failed to cleanup job {job_id}: {e}")
     
+    @staticmethod
+    def _rmtree_fast(path: str) -> None:
+        """
+        Remove a directory tree using os.scandir.
+        
+        Unlike shutil.rmtree this reuses the entry type reported by scandir
+        instead of issuing an extra stat per entry. Symlinks are unlinked,
+        never followed.
+        
+        Args:
+            path: Directory to remove
+        """
+        # Directories are removed after their contents, in reverse discovery order
+        stack = [path]
+        dirs = []
+        while stack:
+            current = stack.pop()
+            dirs.append(current)
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        os.unlink(entry.path)
+        for directory in reversed(dirs):
+            os.rmdir(directory)
+    
     async def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
         """
         Get current job status.
@@ -373,4 +604,4 @@ class AgentWorker:
         Returns:
             Job details or None if not found
         """
-        return self.db.get_job(job_id)
\ No newline at end of file
+        return await self.db.aget_job(job_id)
\ No newline at end of file
@@ -6,175 +6,327 @@ SQLite database operations for job management
 
 import sqlite3
 import json
+import asyncio
 import logging
-import datetime
-from typing import Optional, List, Dict
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Callable, Iterable
 
 logger = logging.getLogger(__name__)
 
+# Local wall-clock time for log lines, computed by SQLite
+_LOG_TIMESTAMP_SQL = "strftime('%H:%M:%S', 'now', 'localtime')"
+
+# ISO-8601 UTC with a 'Z' suffix for created_at/updated_at, so clients parse
+# it unambiguously and the text sorts chronologically
+_TIMESTAMP_FMT = '%Y-%m-%dT%H:%M:%SZ'
+_TIMESTAMP_SQL = f"strftime('{_TIMESTAMP_FMT}', 'now')"
+
 class Database:
     """
     Database handler for Celia AI Agent
-    Uses SQLite for persistent storage
+    Uses SQLite for persistent storage over a single long-lived connection
     """
     
+    SCHEMA_VERSION = 1  # Stored in PRAGMA user_version
+    PAGE_SIZE = 8192  # Bytes per database page
+    MMAP_SIZE = 256 * 1024 * 1024  # Bytes of the file read through mmap
+    LEGACY_LINE_CHARS = 256  # Assumed line length when tailing jobs.logs
+    
     def __init__(self, db_path: str = "./celia.db"):
         self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
         self._init_db()
         logger.info(f"Database initialized at {db_path}")
     
     def _init_db(self):
-        """Initialize database schema"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS jobs (
-                job_id TEXT PRIMARY KEY,
-                task TEXT NOT NULL,
-                repo_url TEXT,
-                status TEXT NOT NULL DEFAULT 'pending',
-                logs TEXT DEFAULT '',
-                files TEXT DEFAULT '[]',
-                error TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_status ON jobs(status)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_created_at ON jobs(created_at DESC)')
-        
-        conn.commit()
-        conn.close()
+        """Initialize connection settings and database schema"""
+        with self._lock:
+            # page_size only changes through a VACUUM, which cannot run in WAL
+            # mode, so existing databases are migrated before enabling WAL
+            page_size = self._conn.execute('PRAGMA page_size').fetchone()[0]
+            if page_size != self.PAGE_SIZE:
+                self._conn.execute('PRAGMA journal_mode=DELETE')
+                self._conn.execute(f'PRAGMA page_size={self.PAGE_SIZE}')
+                self._conn.execute('VACUUM')
+                logger.info(f"Database page size changed from {page_size} to {self.PAGE_SIZE}")
+            
+            self._conn.execute(f'PRAGMA mmap_size={self.MMAP_SIZE}')
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('PRAGMA temp_store=MEMORY')
+            self._conn.execute('PRAGMA foreign_keys=ON')
+            
+            self._conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    task TEXT NOT NULL,
+                    repo_url TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    logs TEXT DEFAULT '',
+                    files TEXT DEFAULT '[]',
+                    error TEXT,
+                    created_at TIMESTAMP DEFAULT ({_TIMESTAMP_SQL}),
+                    updated_at TIMESTAMP DEFAULT ({_TIMESTAMP_SQL})
+                )
+            ''')
+            
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_status ON jobs(status)')
+            # Ascending index serves both the cleanup range scan and (walked
+            # backwards) the newest-first listings
+            self._conn.execute('DROP INDEX IF EXISTS idx_created_at')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at)')
+            
+            # Append-only log lines; jobs.logs is kept for rows written before
+            # this table existed
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS job_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+                    ts TEXT NOT NULL,
+                    message TEXT NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_job_logs_job ON job_logs(job_id, id)')
+            
+            if self._conn.execute('PRAGMA user_version').fetchone()[0] < 1:
+                self._normalize_timestamps()
+                self._conn.execute(f'PRAGMA user_version={self.SCHEMA_VERSION}')
 
-    def create_job(self, job_id: str, task: str, repo_url: Optional[str] = None):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        now = datetime.datetime.now().isoformat()
-        
-        cursor.execute('''
-            INSERT INTO jobs (job_id, task, repo_url, status, logs, created_at, updated_at)
-            VALUES (?, ?, ?, 'pending', ?, ?, ?)
-        ''', (job_id, task, repo_url, f"[{now}] Job created\n", now, now))
-        
-        conn.commit()
-        conn.close()
-        return job_id
+    def _normalize_timestamps(self):
+        """Rewrite legacy created_at/updated_at values as ISO-8601 UTC"""
+        # Older rows hold either local-time isoformat() text ('T' separator,
+        # no zone) or SQLite's UTC 'YYYY-MM-DD HH:MM:SS'; the 'utc' modifier
+        # converts the former from local time
+        self._conn.execute('BEGIN')
+        for column in ('created_at', 'updated_at'):
+            self._conn.execute(f'''
+                UPDATE jobs SET {column} = CASE
+                    WHEN {column} LIKE '%T%' THEN strftime('{_TIMESTAMP_FMT}', {column}, 'utc')
+                    ELSE strftime('{_TIMESTAMP_FMT}', {column})
+                END
+                WHERE {column} IS NOT NULL AND {column} NOT LIKE '%Z'
+            ''')
+        self._conn.execute('COMMIT')
+
+    @contextmanager
+    def _transaction(self, immediate: bool = False):
+        """Run several statements atomically under the connection lock"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def close(self):
+        """Close the underlying connection"""
+        with self._lock:
+            self._conn.close()
+
+    def create_job(self, job_id: str, task: str, repo_url: Optional[str] = None) -> dict:
+        """Insert a pending job and return its job_id, status and created_at"""
+        # Timestamps are set explicitly since databases created before the
+        # ISO-8601 defaults still carry CURRENT_TIMESTAMP column defaults
+        with self._transaction() as conn:
+            row = conn.execute(f'''
+                INSERT INTO jobs (job_id, task, repo_url, status, created_at, updated_at)
+                VALUES (?, ?, ?, 'pending', {_TIMESTAMP_SQL}, {_TIMESTAMP_SQL})
+                RETURNING job_id, status, created_at
+            ''', (job_id, task, repo_url)).fetchone()
+            conn.execute(f'''
+                INSERT INTO job_logs (job_id, ts, message) VALUES (?, {_LOG_TIMESTAMP_SQL}, 'Job created')
+            ''', (job_id,))
+        return dict(row)
 
     def update_job_status(self, job_id: str, status: str):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE jobs 
-            SET status = ?, updated_at = CURRENT_TIMESTAMP 
-            WHERE job_id = ?
-        ''', (status, job_id))
-        conn.commit()
-        conn.close()
+        with self._lock:
+            self._conn.execute(f'''
+                UPDATE jobs 
+                SET status = ?, updated_at = {_TIMESTAMP_SQL} 
+                WHERE job_id = ?
+            ''', (status, job_id))
 
     def set_error(self, job_id: str, error_msg: str):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE jobs 
-            SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP 
-            WHERE job_id = ?
-        ''', (error_msg, job_id))
-        conn.commit()
-        conn.close()
+        with self._lock:
+            self._conn.execute(f'''
+                UPDATE jobs 
+                SET status = 'failed', error = ?, updated_at = {_TIMESTAMP_SQL} 
+                WHERE job_id = ?
+            ''', (error_msg, job_id))
         self.append_log(job_id, f"[ERROR] {error_msg}")
 
     def append_log(self, job_id: str, message: str):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        log_line = f"[{timestamp}] {message}\n"
-        
-        cursor.execute('''
-            UPDATE jobs 
-            SET logs = logs || ?, updated_at = CURRENT_TIMESTAMP 
-            WHERE job_id = ?
-        ''', (log_line, job_id))
-        
-        conn.commit()
-        conn.close()
+        self.append_logs(job_id, [message])
+
+    def append_logs(self, job_id: str, messages: List[str]):
+        """Append several log lines in a single transaction"""
+        # Lines for unknown (e.g. deleted) jobs are dropped silently
+        with self._transaction() as conn:
+            conn.executemany(f'''
+                INSERT INTO job_logs (job_id, ts, message)
+                SELECT ?, {_LOG_TIMESTAMP_SQL}, ? WHERE EXISTS (SELECT 1 FROM jobs WHERE job_id = ?)
+            ''', [(job_id, message, job_id) for message in messages])
 
     def add_file(self, job_id: str, file_path: str):
-        job = self.get_job(job_id)
-        if job:
-            files = job['files']
-            if file_path not in files:
-                files.append(file_path)
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE jobs 
-                    SET files = ?, updated_at = CURRENT_TIMESTAMP 
-                    WHERE job_id = ?
-                ''', (json.dumps(files), job_id))
-                conn.commit()
-                conn.close()
+        """Append a file to the job's list unless it is already there"""
+        with self._lock:
+            self._conn.execute(f'''
+                UPDATE jobs 
+                SET files = json_insert(files, '$[#]', ?), updated_at = {_TIMESTAMP_SQL} 
+                WHERE job_id = ?
+                  AND NOT EXISTS (SELECT 1 FROM json_each(jobs.files) WHERE value = ?)
+            ''', (file_path, job_id, file_path))
 
     def get_job(self, job_id: str) -> Optional[dict]:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            log_rows = self._conn.execute(
+                'SELECT ts, message FROM job_logs WHERE job_id = ? ORDER BY id', (job_id,)
+            ).fetchall()
         
-        if row:
-            job = dict(row)
-            job['files'] = json.loads(job['files']) if job['files'] else []
-            return job
-        return None
+        job = dict(row)
+        job['files'] = json.loads(job['files']) if job['files'] else []
+        job['logs'] = (job['logs'] or '') + self._format_log_lines(log_rows)
+        return job
+
+    def get_log_tail(self, job_id: str, n: int = 50) -> Optional[str]:
+        """Return the job's most recent n log lines, or None if the job does not exist"""
+        with self._lock:
+            if self._conn.execute('SELECT 1 FROM jobs WHERE job_id = ?', (job_id,)).fetchone() is None:
+                return None
+            log_rows = self._conn.execute('''
+                SELECT ts, message FROM job_logs
+                WHERE job_id = ? ORDER BY id DESC LIMIT ?
+            ''', (job_id, n)).fetchall()
+            # Lines written before job_logs existed live in jobs.logs and
+            # precede every job_logs row
+            missing = n - len(log_rows)
+            legacy_tail = self._legacy_log_tail(job_id, missing) if missing > 0 else ''
+        
+        return legacy_tail + self._format_log_lines(reversed(log_rows))
+
+    def _legacy_log_tail(self, job_id: str, n: int) -> str:
+        """Return the last n lines of jobs.logs; caller holds the lock"""
+        # Fetch only the end of the column, widening the window until it
+        # holds n complete lines or the whole value
+        window = n * self.LEGACY_LINE_CHARS
+        while True:
+            tail = self._conn.execute(
+                'SELECT substr(logs, -?) FROM jobs WHERE job_id = ?', (window, job_id)
+            ).fetchone()[0] or ''
+            lines = tail.splitlines(keepends=True)
+            # When the window was filled, lines[0] may be cut off mid-line
+            if len(tail) < window or len(lines) > n:
+                return "".join(lines[-n:])
+            window *= 4
 
     def list_jobs(self, limit: int = 50) -> List[dict]:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,))
-        rows = cursor.fetchall()
-        conn.close()
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)
+            ).fetchall()
+            log_rows = self._conn.execute('''
+                SELECT job_id, ts, message FROM job_logs
+                WHERE job_id IN (SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT ?)
+                ORDER BY id
+            ''', (limit,)).fetchall()
+        
+        logs_by_job: Dict[str, List[sqlite3.Row]] = defaultdict(list)
+        for log_row in log_rows:
+            logs_by_job[log_row['job_id']].append(log_row)
         
         jobs = []
         for row in rows:
             job = dict(row)
             job['files'] = json.loads(job['files']) if job['files'] else []
+            job['logs'] = (job['logs'] or '') + self._format_log_lines(logs_by_job[job['job_id']])
             jobs.append(job)
         return jobs
 
-    def delete_job(self, job_id: str):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
-        conn.commit()
-        conn.close()
+    @staticmethod
+    def _format_log_lines(log_rows: Iterable[sqlite3.Row]) -> str:
+        return "".join(f"[{row['ts']}] {row['message']}\n" for row in log_rows)
+
+    def list_jobs_summary(self, limit: int = 50, offset: int = 0) -> List[dict]:
+        """List jobs without their logs or files, newest first"""
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT job_id, status, created_at, repo_url, substr(task, 1, 200) AS task
+                FROM jobs ORDER BY created_at DESC LIMIT ? OFFSET ?
+            ''', (limit, offset)).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete_job(self, job_id: str) -> bool:
+        """Delete a job, returning whether it existed"""
+        with self._lock:
+            cursor = self._conn.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
+        return cursor.rowcount > 0
 
     def get_stats(self) -> Dict:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT status, COUNT(*) as count FROM jobs GROUP BY status')
-        status_counts = {row['status']: row['count'] for row in cursor.fetchall()}
-        
-        cursor.execute('SELECT COUNT(*) as total FROM jobs')
-        total = cursor.fetchone()['total']
+        with self._lock:
+            cursor = self._conn.execute('SELECT status, COUNT(*) as count FROM jobs GROUP BY status')
+            status_counts = {row['status']: row['count'] for row in cursor.fetchall()}
         
-        conn.close()
         return {
-            'total_jobs': total,
+            'total_jobs': sum(status_counts.values()),
             'by_status': status_counts
         }
 
     def cleanup_old_jobs(self, days: int = 30) -> int:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM jobs WHERE created_at < datetime('now', '-' || ? || ' days')", (days,))
-        deleted_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+        cutoff = f"strftime('{_TIMESTAMP_FMT}', 'now', '-' || ? || ' days')"
+        
+        # One write transaction, taken up front, for logs and jobs together
+        with self._transaction(immediate=True) as conn:
+            conn.execute(f'''
+                DELETE FROM job_logs WHERE job_id IN (
+                    SELECT job_id FROM jobs WHERE created_at < {cutoff}
+                )
+            ''', (days,))
+            cursor = conn.execute(f"DELETE FROM jobs WHERE created_at < {cutoff}", (days,))
+            deleted_count = cursor.rowcount
         logger.info(f"Cleaned up {deleted_count} jobs older than {days} days")
         return deleted_count
+
+    # Async variants: run the blocking call in a worker thread so the event
+    # loop keeps serving other coroutines during SQLite I/O
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.to_thread(fn, *args)
+
+    async def acreate_job(self, job_id: str, task: str, repo_url: Optional[str] = None) -> dict:
+        return await self._run(self.create_job, job_id, task, repo_url)
+
+    async def aupdate_job_status(self, job_id: str, status: str):
+        await self._run(self.update_job_status, job_id, status)
+
+    async def aset_error(self, job_id: str, error_msg: str):
+        await self._run(self.set_error, job_id, error_msg)
+
+    async def aappend_logs(self, job_id: str, messages: List[str]):
+        await self._run(self.append_logs, job_id, messages)
+
+    async def aadd_file(self, job_id: str, file_path: str):
+        await self._run(self.add_file, job_id, file_path)
+
+    async def aget_job(self, job_id: str) -> Optional[dict]:
+        return await self._run(self.get_job, job_id)
+
+    async def aget_log_tail(self, job_id: str, n: int = 50) -> Optional[str]:
+        return await self._run(self.get_log_tail, job_id, n)
+
+    async def alist_jobs(self, limit: int = 50) -> List[dict]:
+        return await self._run(self.list_jobs, limit)
+
+    async def alist_jobs_summary(self, limit: int = 50, offset: int = 0) -> List[dict]:
+        return await self._run(self.list_jobs_summary, limit, offset)
+
+    async def adelete_job(self, job_id: str) -> bool:
+        return await self._run(self.delete_job, job_id)
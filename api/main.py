@@ -1,5 +1,5 @@
 
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Request
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, JSONResponse
 from contextlib import asynccontextmanager
@@ -7,9 +7,10 @@ import os
 import logging
 from typing import List
 
-from api.models import JobCreate, JobResponse, JobDetail
+from api.models import JobCreate, JobResponse, JobDetail, JobSummary, JobLogs
 from api.database import Database
 from agent.worker import AgentWorker
+from agent.gemini_client import GeminiClient
 
 # Enhanced Logging Configuration
 logging.basicConfig(
@@ -23,7 +24,8 @@ DB_PATH = os.path.join(os.getcwd(), "data", "celia.db")
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
 db = Database(DB_PATH)
-worker = AgentWorker(db)
+gemini = GeminiClient()
+worker = AgentWorker(db, gemini=gemini)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -31,6 +33,9 @@ async def lifespan(app: FastAPI):
     logger.info("Celia Backend Lifespan started.")
     yield
     logger.info("Celia Backend Lifespan shutting down.")
+    await worker.aclose()
+    await gemini.aclose()
+    db.close()
 
 app = FastAPI(title="Celia AI Agent API", version="2.5.0", lifespan=lifespan)
 
@@ -53,33 +58,43 @@ async def global_exception_handler(request: Request, exc: Exception):
 @app.post("/jobs", response_model=JobResponse)
 async def create_job(job_data: JobCreate, background_tasks: BackgroundTasks):
     try:
-        job_id = worker.create_job(job_data.task, job_data.repo_url)
-        background_tasks.add_task(worker.execute_job, job_id=job_id)
-        job = db.get_job(job_id)
-        return JobResponse(job_id=job_id, status=job['status'], created_at=job['created_at'])
+        job = await worker.create_job(job_data.task, job_data.repo_url)
+        background_tasks.add_task(worker.execute_job, job_id=job['job_id'])
+        return JobResponse(**job)
     except Exception as e:
         logger.error(f"Failed to create job: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/jobs", response_model=List[JobDetail])
-async def list_jobs():
-    return db.list_jobs()
+@app.get("/jobs", response_model=List[JobSummary])
+async def list_jobs(
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    return await db.alist_jobs_summary(limit, offset)
 
 @app.get("/jobs/{job_id}", response_model=JobDetail)
 async def get_job(job_id: str):
-    job = db.get_job(job_id)
+    job = await db.aget_job(job_id)
     if not job: raise HTTPException(status_code=404, detail="Job not found")
     return job
 
+@app.get("/jobs/{job_id}/logs", response_model=JobLogs)
+async def get_job_logs(job_id: str, tail: int = Query(200, ge=1, le=5000)):
+    logs = await db.aget_log_tail(job_id, tail)
+    if logs is None: raise HTTPException(status_code=404, detail="Job not found")
+    return JobLogs(job_id=job_id, logs=logs)
+
 @app.get("/jobs/{job_id}/status")
 async def get_status(job_id: str):
-    job = db.get_job(job_id)
+    job = await db.aget_job(job_id)
     if not job: raise HTTPException(status_code=404, detail="Job not found")
     return {"status": job['status']}
 
 @app.delete("/jobs/{job_id}")
 async def delete_job(job_id: str):
-    db.delete_job(job_id)
+    if not await db.adelete_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    await worker.cleanup_job(job_id)
     return {"message": "Job deleted"}
 
 @app.get("/jobs/{job_id}/download/{filename}")
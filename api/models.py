@@ -1,5 +1,5 @@
 
-from pydantic import BaseModel, HttpUrl
+from pydantic import AliasChoices, BaseModel, Field, HttpUrl
 from typing import List, Optional
 from enum import Enum
 from datetime import datetime
@@ -19,11 +19,22 @@ class JobResponse(BaseModel):
     status: JobStatus
     created_at: str
 
+class JobSummary(BaseModel):
+    id: str = Field(validation_alias=AliasChoices("id", "job_id"))
+    task: str
+    repo_url: Optional[str] = None
+    status: JobStatus
+    created_at: str
+
 class JobDetail(BaseModel):
-    id: str
+    id: str = Field(validation_alias=AliasChoices("id", "job_id"))
     task: str
     repo_url: Optional[str] = None
     status: JobStatus
     logs: str
     files: List[str]
     created_at: str
+
+class JobLogs(BaseModel):
+    job_id: str
+    logs: str
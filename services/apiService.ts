@@ -2,8 +2,8 @@
 const API_BASE_URL = 'http://localhost:8000';
 
 export const apiService = {
-  async listJobs(): Promise<any[]> {
-    const res = await fetch(`${API_BASE_URL}/jobs`);
+  async listJobs(limit = 50, offset = 0): Promise<any[]> {
+    const res = await fetch(`${API_BASE_URL}/jobs?limit=${limit}&offset=${offset}`);
     if (!res.ok) throw new Error('Failed to fetch jobs');
     return res.json();
   },
@@ -24,6 +24,12 @@ export const apiService = {
     return res.json();
   },
 
+  async getJobLogs(jobId: string, tail = 200): Promise<{ job_id: string; logs: string }> {
+    const res = await fetch(`${API_BASE_URL}/jobs/${jobId}/logs?tail=${tail}`);
+    if (!res.ok) throw new Error('Failed to fetch job logs');
+    return res.json();
+  },
+
   async getStatus(jobId: string): Promise<{ status: string }> {
     const res = await fetch(`${API_BASE_URL}/jobs/${jobId}/status`);
     if (!res.ok) throw new Error('Failed to fetch job status');
@@ -0,0 +1,22 @@
+"""
+Shared pytest fixtures for the Celia AI Agent backend
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Make the top-level api/ and agent/ packages importable when pytest is run
+# from any directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.database import Database  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A Database backed by a fresh file in the test's temp directory"""
+    database = Database(str(tmp_path / "celia.db"))
+    yield database
+    database.close()
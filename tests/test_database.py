@@ -0,0 +1,215 @@
+"""
+Tests for the SQLite job store
+"""
+
+import re
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from api.database import Database
+
+ISO_UTC_RE = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z$')
+
+
+def test_create_job_returns_stored_fields(db):
+    job = db.create_job('aaaaaaaaaaaa', 'task', 'https://example.com/repo.git')
+
+    stored = db.get_job('aaaaaaaaaaaa')
+    assert job == {'job_id': 'aaaaaaaaaaaa', 'status': 'pending', 'created_at': stored['created_at']}
+    assert stored['repo_url'] == 'https://example.com/repo.git'
+
+
+def test_create_job_rejects_duplicate_id(db):
+    db.create_job('aaaaaaaaaaaa', 'first')
+
+    with pytest.raises(sqlite3.IntegrityError):
+        db.create_job('aaaaaaaaaaaa', 'second')
+
+    assert db.get_job('aaaaaaaaaaaa')['task'] == 'first'
+
+
+def test_connection_uses_wal(db):
+    assert db._conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert db._conn.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+
+
+def test_append_logs_keeps_order(db):
+    db.create_job('aaaaaaaaaaaa', 'task')
+
+    db.append_logs('aaaaaaaaaaaa', ["one", "two"])
+    db.append_log('aaaaaaaaaaaa', "three")
+
+    lines = db.get_job('aaaaaaaaaaaa')['logs'].splitlines()
+    assert [line.split('] ', 1)[1] for line in lines] == ["Job created", "one", "two", "three"]
+
+
+def test_append_logs_ignores_unknown_job(db):
+    db.append_logs('missingjob00', ["lost"])
+
+    assert db._conn.execute('SELECT COUNT(*) FROM job_logs').fetchone()[0] == 0
+
+
+def test_add_file_skips_duplicates(db):
+    db.create_job('aaaaaaaaaaaa', 'task')
+
+    for path in ("a.py", "b.py", "a.py"):
+        db.add_file('aaaaaaaaaaaa', path)
+
+    assert db.get_job('aaaaaaaaaaaa')['files'] == ["a.py", "b.py"]
+
+
+def _messages(log_text):
+    return [line.split('] ', 1)[1] for line in log_text.splitlines()]
+
+
+def test_get_log_tail_returns_last_lines(db):
+    db.create_job('aaaaaaaaaaaa', 'task')
+    db.append_logs('aaaaaaaaaaaa', [f"line {i}" for i in range(10)])
+
+    assert _messages(db.get_log_tail('aaaaaaaaaaaa', 3)) == ["line 7", "line 8", "line 9"]
+
+
+def test_get_log_tail_fills_from_legacy_logs(db):
+    db.create_job('aaaaaaaaaaaa', 'task')
+    legacy = "".join(f"[10:00:00] legacy {i} {'x' * i}\n" for i in range(20))
+    db._conn.execute('UPDATE jobs SET logs = ? WHERE job_id = ?', (legacy, 'aaaaaaaaaaaa'))
+    # A short guess forces the window to widen and cut through a line
+    db.LEGACY_LINE_CHARS = 5
+
+    tail = db.get_log_tail('aaaaaaaaaaaa', 4)
+
+    assert _messages(tail) == [
+        f"legacy 17 {'x' * 17}", f"legacy 18 {'x' * 18}", f"legacy 19 {'x' * 19}", "Job created"
+    ]
+    assert db.get_log_tail('aaaaaaaaaaaa', 100).startswith("[10:00:00] legacy 0 \n")
+
+
+def test_list_jobs_summary_is_newest_first_and_paginated(db):
+    for i, job_id in enumerate(['aaaaaaaaaaa1', 'aaaaaaaaaaa2', 'aaaaaaaaaaa3']):
+        db.create_job(job_id, 'task ' + 'x' * 300)
+        db._conn.execute(
+            'UPDATE jobs SET created_at = ? WHERE job_id = ?', (f'2026-01-0{i + 1}T00:00:00Z', job_id)
+        )
+
+    first_page = db.list_jobs_summary(limit=2)
+    second_page = db.list_jobs_summary(limit=2, offset=2)
+
+    assert [job['job_id'] for job in first_page] == ['aaaaaaaaaaa3', 'aaaaaaaaaaa2']
+    assert [job['job_id'] for job in second_page] == ['aaaaaaaaaaa1']
+    assert set(first_page[0]) == {'job_id', 'status', 'created_at', 'repo_url', 'task'}
+    assert len(first_page[0]['task']) == 200
+
+
+def test_get_log_tail_of_unknown_job_is_none(db):
+    assert db.get_log_tail('missingjob00') is None
+
+
+def test_cleanup_old_jobs_removes_jobs_and_logs(db):
+    db.create_job('aaaaaaaaaaa1', 'old')
+    db.create_job('aaaaaaaaaaa2', 'new')
+    db._conn.execute(
+        "UPDATE jobs SET created_at = '2020-01-01T00:00:00Z' WHERE job_id = 'aaaaaaaaaaa1'"
+    )
+
+    assert db.cleanup_old_jobs(days=30) == 1
+
+    assert db.get_job('aaaaaaaaaaa1') is None
+    assert db.get_job('aaaaaaaaaaa2') is not None
+    remaining = db._conn.execute('SELECT DISTINCT job_id FROM job_logs').fetchall()
+    assert [row['job_id'] for row in remaining] == ['aaaaaaaaaaa2']
+
+
+def test_delete_job_reports_existence_and_drops_logs(db):
+    db.create_job('aaaaaaaaaaaa', 'task')
+    db.append_log('aaaaaaaaaaaa', "line")
+
+    assert db.delete_job('aaaaaaaaaaaa') is True
+    assert db.delete_job('aaaaaaaaaaaa') is False
+    assert db._conn.execute('SELECT COUNT(*) FROM job_logs').fetchone()[0] == 0
+
+
+def _legacy_database(path, rows):
+    """Create a database file with the schema used before job_logs existed"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE jobs (
+            job_id TEXT PRIMARY KEY,
+            task TEXT NOT NULL,
+            repo_url TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            logs TEXT DEFAULT '',
+            files TEXT DEFAULT '[]',
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany(
+        'INSERT INTO jobs (job_id, task, created_at, updated_at) VALUES (?, ?, ?, ?)', rows
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_timestamps_are_iso_utc(db):
+    job = db.create_job('aaaaaaaaaaaa', 'task')
+    db.update_job_status('aaaaaaaaaaaa', 'running')
+
+    stored = db.get_job('aaaaaaaaaaaa')
+    assert ISO_UTC_RE.match(job['created_at'])
+    assert ISO_UTC_RE.match(stored['updated_at'])
+    assert db._conn.execute('PRAGMA user_version').fetchone()[0] == Database.SCHEMA_VERSION
+
+
+def test_legacy_timestamps_are_normalized(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    local_time = '2026-01-02T03:04:05.123456'
+    _legacy_database(path, [
+        ('aaaaaaaaaaa1', 'sqlite default', '2026-01-02 03:04:05', '2026-01-02 03:04:05'),
+        ('aaaaaaaaaaa2', 'isoformat', local_time, local_time),
+    ])
+
+    db = Database(path)
+    try:
+        expected = datetime.fromisoformat(local_time).astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        assert db.get_job('aaaaaaaaaaa1')['created_at'] == '2026-01-02T03:04:05Z'
+        assert db.get_job('aaaaaaaaaaa2')['created_at'] == expected
+        assert db.get_job('aaaaaaaaaaa2')['updated_at'] == expected
+        # New rows get explicit ISO timestamps despite the old column defaults
+        assert ISO_UTC_RE.match(db.create_job('aaaaaaaaaaa3', 'task')['created_at'])
+    finally:
+        db.close()
+
+
+def test_new_database_uses_page_size(db):
+    assert db._conn.execute('PRAGMA page_size').fetchone()[0] == Database.PAGE_SIZE
+
+
+def test_existing_database_is_migrated_to_page_size(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    _legacy_database(path, [('aaaaaaaaaaa1', 'kept', '2026-01-02 03:04:05', '2026-01-02 03:04:05')])
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA page_size').fetchone()[0] == 4096
+    conn.close()
+
+    db = Database(path)
+    try:
+        assert db._conn.execute('PRAGMA page_size').fetchone()[0] == Database.PAGE_SIZE
+        assert db._conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert db.get_job('aaaaaaaaaaa1')['task'] == 'kept'
+    finally:
+        db.close()
+
+
+def test_get_stats_counts_jobs_by_status(db):
+    for job_id in ('aaaaaaaaaaa1', 'aaaaaaaaaaa2', 'aaaaaaaaaaa3'):
+        db.create_job(job_id, 'task')
+    db.update_job_status('aaaaaaaaaaa1', 'completed')
+    db.set_error('aaaaaaaaaaa2', 'boom')
+
+    assert db.get_stats() == {
+        'total_jobs': 3,
+        'by_status': {'completed': 1, 'failed': 1, 'pending': 1},
+    }
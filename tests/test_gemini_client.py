@@ -0,0 +1,199 @@
+"""
+Tests for GeminiClient; HTTP traffic goes to an httpx mock transport
+"""
+
+import asyncio
+import functools
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+pytest.importorskip("google.genai")
+
+from google.genai import errors as genai_errors  # noqa: E402
+
+from agent import gemini_client  # noqa: E402
+from agent.gemini_client import GeminiClient, RateLimitConfig, RateLimiter  # noqa: E402
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the limiter sleeps"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(gemini_client, "time", SimpleNamespace(monotonic=fake.monotonic))
+    monkeypatch.setattr(asyncio, "sleep", fake.sleep)
+    return fake
+
+
+@pytest.fixture
+def client():
+    return GeminiClient(api_key="test-key")
+
+
+@pytest.mark.anyio
+async def test_rate_limiter_skips_lock_within_limit(clock):
+    limiter = RateLimiter(RateLimitConfig(requests_per_minute=3))
+
+    for _ in range(3):
+        await limiter.acquire()
+
+    assert clock.sleeps == []
+    assert not limiter.lock.locked()
+    assert len(limiter.request_timestamps) == 3
+
+
+@pytest.mark.anyio
+async def test_rate_limiter_waits_for_window(clock):
+    limiter = RateLimiter(RateLimitConfig(requests_per_minute=2))
+
+    await limiter.acquire()
+    clock.now += 10
+    await limiter.acquire()
+    await limiter.acquire()
+
+    # The third request waits until the first leaves the 60s window
+    assert clock.sleeps == [pytest.approx(50.0)]
+    assert len(limiter.request_timestamps) == 2
+
+
+def _rate_limited(retry_after):
+    response = httpx.Response(429, headers={"Retry-After": retry_after})
+    return genai_errors.ClientError(429, {"error": {"status": "RESOURCE_EXHAUSTED"}}, response)
+
+
+def _failing_then(errors, result="ok"):
+    """A generation method that raises each error in turn, then succeeds"""
+    calls = []
+
+    async def method(**kwargs):
+        calls.append(kwargs)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return method, calls
+
+
+@pytest.mark.anyio
+async def test_retry_honors_retry_after_with_jitter(client, clock):
+    method, calls = _failing_then([_rate_limited("3")])
+
+    assert await client._call_with_retry(method, "ping", {}) == "ok"
+
+    assert len(calls) == 2
+    assert len(clock.sleeps) == 1
+    assert 3.0 <= clock.sleeps[0] <= 3.0 + client.retry_config.base_delay
+
+
+@pytest.mark.anyio
+async def test_retry_stops_when_retry_after_exceeds_max_delay(client, clock):
+    method, calls = _failing_then([_rate_limited("120")])
+
+    with pytest.raises(RuntimeError, match="after 1 attempts"):
+        await client._call_with_retry(method, "ping", {})
+
+    assert len(calls) == 1
+    assert clock.sleeps == []
+    assert client.get_usage_stats()["failed_requests"] == 1
+
+
+@pytest.mark.anyio
+async def test_retry_backoff_without_retry_after_is_capped(client, clock):
+    error = genai_errors.ServerError(503, {"error": {"status": "UNAVAILABLE"}})
+    method, calls = _failing_then([error, error])
+
+    assert await client._call_with_retry(method, "ping", {}) == "ok"
+
+    assert len(calls) == 3
+    assert all(0 <= delay <= client.retry_config.max_delay for delay in clock.sleeps)
+
+
+def test_summary_prompt_fits_message_limit(client):
+    logs = ["x" * 10000] * 50 + ["last line"]
+
+    prompt = client._build_summary_prompt(logs, ["out.txt"], 12.5, "completed")
+
+    client._validate_message(prompt)
+    assert "[earlier logs truncated]" in prompt
+    assert "last line" in prompt
+
+
+def _mock_transport(handler, monkeypatch):
+    """Route the client's connection pool through an httpx mock transport"""
+    monkeypatch.setattr(
+        gemini_client.httpx, "AsyncClient",
+        functools.partial(httpx.AsyncClient, transport=httpx.MockTransport(handler)),
+    )
+
+
+@pytest.mark.anyio
+async def test_requests_go_through_the_client_pool(client, monkeypatch):
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        return httpx.Response(200, json={
+            "candidates": [{"content": {"role": "model", "parts": [{"text": "pong"}]}}],
+            "usageMetadata": {"totalTokenCount": 7},
+        })
+
+    _mock_transport(handler, monkeypatch)
+
+    assert await client.send_message("ping") == "pong"
+    assert paths == [f"/v1beta/models/{client.model}:generateContent"]
+    assert client.get_usage_stats()["total_tokens"] == 7
+    await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_create_plan_drops_only_malformed_steps(client, monkeypatch):
+    response = """[
+        {"action": "Install dependencies", "commands": ["pip install -r requirements.txt"], "estimated_time": 5},
+        {"action": "Inspect", "commands": null},
+        {"action": "Run tests", "commands": ["pytest", 3]},
+        "not a step",
+        {"action": "Build", "commands": ["make"], "estimated_time": "2 minutes"}
+    ]"""
+
+    async def send_message(message, config_preset):
+        return response
+
+    monkeypatch.setattr(client, "send_message", send_message)
+
+    plan = await client.create_plan("build it")
+
+    assert [step['action'] for step in plan] == ["Install dependencies", "Inspect", "Build"]
+    assert [step['step_number'] for step in plan] == [1, 2, 3]
+    assert plan[0]['estimated_time'] == "5 minutes"
+    assert plan[1]['commands'] == []
+    assert plan[2]['estimated_time'] == "2 minutes"
+
+
+@pytest.mark.anyio
+async def test_aclose_allows_reuse(client):
+    await client._get_ai()
+    first = client._http_client
+    await client.aclose()
+
+    await client._get_ai()
+    second = client._http_client
+    await client.aclose()
+
+    assert first.is_closed and second.is_closed
+    assert first is not second
+    assert client._http_client is None
@@ -0,0 +1,221 @@
+"""
+Tests for AgentWorker
+"""
+
+import asyncio
+import os
+import secrets
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+from agent.worker import AgentWorker  # noqa: E402
+
+
+@pytest.fixture
+def worker(db, tmp_path):
+    """An AgentWorker with its own jobs directory; Gemini is never called"""
+    return AgentWorker(db, jobs_base_dir=tmp_path / "jobs", gemini=SimpleNamespace())
+
+
+@pytest.mark.anyio
+async def test_create_job_returns_fields_and_workspace(worker):
+    job = await worker.create_job("  build it  ")
+
+    stored = worker.db.get_job(job['job_id'])
+    assert job == {key: stored[key] for key in ('job_id', 'status', 'created_at')}
+    assert job['status'] == 'pending'
+    assert stored['task'] == "build it"
+    assert sorted(os.listdir(worker.jobs_base_dir / job['job_id'])) == ['output', 'workspace']
+
+
+@pytest.mark.anyio
+async def test_create_job_retries_id_collision(worker, monkeypatch):
+    ids = iter(['aaaaaaaaaaaa', 'aaaaaaaaaaaa', 'bbbbbbbbbbbb'])
+    monkeypatch.setattr(secrets, "token_hex", lambda nbytes: next(ids))
+    await worker.create_job("first")
+
+    job = await worker.create_job("second")
+
+    assert job['job_id'] == 'bbbbbbbbbbbb'
+    assert worker.db.get_job('aaaaaaaaaaaa')['task'] == "first"
+
+
+@pytest.mark.parametrize("url", [
+    "https://github.com/user/repo.git",
+    "HTTP://example.com/repo",
+    "git://example.com/repo.git",
+])
+def test_validate_repo_url_accepts_remote_schemes(worker, url):
+    worker._validate_repo_url(url)
+
+
+@pytest.mark.parametrize("url", [
+    "",
+    "ssh://example.com/repo.git",
+    "file:///etc/passwd",
+    "/srv/repo.git",
+    "https://example.com/?next=file:///etc",
+    "https://example.com/" + "a" * 500,
+])
+def test_validate_repo_url_rejects(worker, url):
+    with pytest.raises(ValueError):
+        worker._validate_repo_url(url)
+
+
+def test_rmtree_fast_unlinks_symlinks_without_following(tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "keep.txt").write_text("keep")
+    tree = tmp_path / "tree"
+    (tree / "nested" / "deeper").mkdir(parents=True)
+    (tree / "nested" / "deeper" / "file.txt").write_text("x")
+    (tree / "link_dir").symlink_to(outside, target_is_directory=True)
+    (tree / "nested" / "link_file").symlink_to(outside / "keep.txt")
+
+    AgentWorker._rmtree_fast(str(tree))
+
+    assert not tree.exists()
+    assert (outside / "keep.txt").read_text() == "keep"
+
+
+@pytest.mark.anyio
+async def test_cleanup_job_removes_workspace(worker):
+    job = await worker.create_job("task")
+
+    await worker.cleanup_job(job['job_id'])
+
+    assert not (worker.jobs_base_dir / job['job_id']).exists()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("job_id", ["..", "../jobs", "", "aaaaaaaaaaaa/../x"])
+async def test_cleanup_job_rejects_invalid_ids(worker, job_id):
+    with pytest.raises(ValueError, match="Invalid job ID"):
+        await worker.cleanup_job(job_id)
+
+
+@pytest.mark.anyio
+async def test_cleanup_job_rejects_symlinked_directory(worker, tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "keep.txt").write_text("keep")
+    (worker.jobs_base_dir / 'aaaaaaaaaaaa').symlink_to(outside, target_is_directory=True)
+
+    with pytest.raises(ValueError, match="escapes"):
+        await worker.cleanup_job('aaaaaaaaaaaa')
+
+    assert (outside / "keep.txt").exists()
+
+
+def _logged(db, job_id):
+    rows = db._conn.execute(
+        'SELECT message FROM job_logs WHERE job_id = ? ORDER BY id', (job_id,)
+    ).fetchall()
+    return [row['message'] for row in rows]
+
+
+@pytest.mark.anyio
+async def test_log_truncates_long_messages(worker):
+    worker._log('aaaaaaaaaaaa', "x" * worker.MAX_LOG_SIZE)
+    worker._log('aaaaaaaaaaaa', "y" * (worker.MAX_LOG_SIZE + 1))
+
+    exact, truncated = worker._recent_logs['aaaaaaaaaaaa']
+    assert exact == "x" * worker.MAX_LOG_SIZE
+    assert truncated == "y" * worker.MAX_LOG_SIZE + "... [TRUNCATED]"
+    worker._log_buffers.clear()
+    await worker.aclose()
+
+
+@pytest.mark.anyio
+async def test_log_lines_are_flushed_in_the_background(worker):
+    worker.db.create_job('aaaaaaaaaaaa', 'task')
+    worker.LOG_FLUSH_INTERVAL = 0.05
+
+    worker._log('aaaaaaaaaaaa', "first")
+    worker._log('aaaaaaaaaaaa', "second")
+    assert _logged(worker.db, 'aaaaaaaaaaaa') == ["Job created"]
+
+    await asyncio.wait_for(worker._flush_task, timeout=5)
+    assert _logged(worker.db, 'aaaaaaaaaaaa') == ["Job created", "first", "second"]
+
+
+@pytest.mark.anyio
+async def test_full_buffer_flushes_early_in_order(worker):
+    worker.db.create_job('aaaaaaaaaaaa', 'task')
+    worker.LOG_FLUSH_INTERVAL = 30
+    worker.LOG_FLUSH_LINES = 10
+    messages = [f"line {i}" for i in range(25)]
+
+    for message in messages:
+        worker._log('aaaaaaaaaaaa', message)
+        await asyncio.sleep(0)
+    for _ in range(100):
+        if len(_logged(worker.db, 'aaaaaaaaaaaa')) > 1:
+            break
+        await asyncio.sleep(0.01)
+
+    flushed = _logged(worker.db, 'aaaaaaaaaaaa')[1:]
+    assert flushed and flushed == messages[:len(flushed)]
+
+    await worker.aclose()
+    assert _logged(worker.db, 'aaaaaaaaaaaa')[1:] == messages
+
+
+@pytest.mark.anyio
+async def test_cancelled_flush_still_writes_its_batch(worker):
+    worker.db.create_job('aaaaaaaaaaaa', 'task')
+    worker._log('aaaaaaaaaaaa', "kept")
+
+    flush = asyncio.create_task(worker._flush_logs())
+    await asyncio.sleep(0)
+    flush.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flush
+
+    assert _logged(worker.db, 'aaaaaaaaaaaa') == ["Job created", "kept"]
+    await worker.aclose()
+
+
+@pytest.fixture
+def slow_git(monkeypatch):
+    """Replace the git subprocess with one that never finishes on its own"""
+    processes = []
+    create_subprocess_exec = asyncio.create_subprocess_exec
+
+    async def fake_exec(*args, **kwargs):
+        process = await create_subprocess_exec('sleep', '30', **kwargs)
+        processes.append(process)
+        return process
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", fake_exec)
+    return processes
+
+
+@pytest.mark.anyio
+async def test_clone_timeout_kills_git(worker, slow_git):
+    worker.CLONE_TIMEOUT = 0.2
+
+    with pytest.raises(RuntimeError, match="timed out"):
+        await worker._clone_repository('aaaaaaaaaaaa', 'https://example.com/repo.git')
+
+    assert slow_git[0].returncode is not None
+    await worker.aclose()
+
+
+@pytest.mark.anyio
+async def test_cancelled_clone_kills_git(worker, slow_git):
+    clone = asyncio.create_task(
+        worker._clone_repository('aaaaaaaaaaaa', 'https://example.com/repo.git')
+    )
+    while not slow_git:
+        await asyncio.sleep(0.01)
+    clone.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await clone
+
+    assert slow_git[0].returncode is not None
+    await worker.aclose()